@@ -3,7 +3,7 @@ from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin
 from .models import (
     Meal, Order, OrderItem, DeliveryType,
-    Location, GiftDetails, Cart, CartItem, UserProfile
+    Location, GiftDetails, Cart, CartItem, PaymentEvent, UserProfile
 )
 
 class CustomUserAdmin(UserAdmin):
@@ -48,7 +48,7 @@ class OrderItemInline(admin.TabularInline):
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'status', 'total_amount', 'created_at', 'is_gift')
     list_filter = ('status', 'delivery_type', 'is_gift')
-    search_fields = ('user__username', 'user__email', 'gift_details__recipient_name')
+    search_fields = ('user__username', 'user__email', 'gift_details__recipient_name', 'payment_intent_id')
     inlines = [OrderItemInline]
     readonly_fields = ('payment_intent_id', 'total_amount', 'created_at', 'updated_at')
     raw_id_fields = ('user', 'gift_details')
@@ -56,14 +56,23 @@ class OrderAdmin(admin.ModelAdmin):
 class CartItemInline(admin.TabularInline):
     model = CartItem
     extra = 0
+    readonly_fields = ('total_price',)
     raw_id_fields = ('meal',)
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
-    list_display = ('user', 'total_amount', 'created_at')
+    list_display = ('user', 'item_count', 'subtotal', 'created_at')
+    list_select_related = ('user',)
     search_fields = ('user__username', 'user__email')
     inlines = [CartItemInline]
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('subtotal', 'item_count', 'created_at', 'updated_at')
     raw_id_fields = ('user',)
 
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ('stripe_event_id', 'type', 'payment_intent_id', 'received_at', 'processed_at')
+    list_filter = ('type',)
+    search_fields = ('stripe_event_id', 'payment_intent_id')
+    readonly_fields = ('stripe_event_id', 'type', 'payment_intent_id', 'payload', 'received_at', 'processed_at')
+
 admin.site.register(UserProfile)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.conf import settings
+
+        from . import checks, profiling, signals, task_metrics  # noqa: F401
+
+        if settings.PROFILING_ENABLED:
+            profiling.install()
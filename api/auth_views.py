@@ -1,7 +1,10 @@
 from rest_framework.views import APIView
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import login, logout
 from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.db.models.functions import Lower
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework import status
 from rest_framework.response import Response
@@ -15,23 +18,47 @@ import requests
 import json
 import os
 from .models import UserProfile
+from .serializers import UserSerializer
+from . import hashing
+from .backends import find_user
 from rest_framework import parsers
 
+def users_with_email(email):
+    # Matches the case-insensitive unique index on auth_user.email
+    return User.objects.alias(email_lower=Lower('email')).filter(email_lower=email.lower(), email__gt='')
+
+def hashing_busy_response():
+    return Response(
+        {'error': 'Too many sign-in attempts right now, please try again shortly.'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': '1'}
+    )
+
 class UserRegistrationView(APIView):
     permission_classes = [AllowAny]
+    throttle_scope = 'register'
     def post(self, request):
         username = request.data.get('username')
         email = request.data.get('email')
         password = request.data.get('password1') or request.data.get('password')
         if not username or not email or not password:
             return Response({'error': 'All fields are required.'}, status=status.HTTP_400_BAD_REQUEST)
-        if User.objects.filter(email=email).exists():
+        if users_with_email(email).exists():
             return Response({'error': 'You already have an account with this email.'}, status=status.HTTP_400_BAD_REQUEST)
         if User.objects.filter(username=username).exists():
             return Response({'error': 'Username already exists.'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Create the user
-        user = User.objects.create_user(username=username, email=email, password=password)
+        user = User(username=username, email=User.objects.normalize_email(email))
+        try:
+            hashing.set_password(user, password)
+        except hashing.HashingBusy:
+            return hashing_busy_response()
+        try:
+            user.save()
+        except IntegrityError:
+            # Lost a race with a concurrent registration for the same email
+            return Response({'error': 'You already have an account with this email.'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Automatically log them in and generate tokens
         refresh = RefreshToken.for_user(user)
@@ -49,45 +76,34 @@ class UserRegistrationView(APIView):
 
 class UserLoginView(APIView):
     permission_classes = [AllowAny]
+    throttle_scope = 'login'
+    throttle_key_fields = ('email', 'username')
     def post(self, request):
         email = request.data.get('email')
         username = request.data.get('username')
         password = request.data.get('password')
         
-        user = None
-        
-        # Try to authenticate with email first
-        if email:
-            try:
-                # Find user by email
-                user_obj = User.objects.get(email=email)
-                # Authenticate with username and password
-                user = authenticate(request, username=user_obj.username, password=password)
-            except User.DoesNotExist:
-                pass
-        
-        # If email login failed, try username login
-        if user is None and username:
-            user = authenticate(request, username=username, password=password)
-        
-        if user is not None:
-            refresh = RefreshToken.for_user(user)
-            return Response({
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-                'user': {'username': user.username, 'email': user.email}
-            })
-        
-        # Check if user exists at all
-        user_exists = False
-        if email:
-            user_exists = User.objects.filter(email=email).exists()
-        if username and not user_exists:
-            user_exists = User.objects.filter(username=username).exists()
-            
-        if not user_exists:
+        # One indexed lookup by email, falling back to username, then verify off the request thread
+        user = find_user(email, username)
+        if user is None:
             return Response({'error': 'Email not found.'}, status=status.HTTP_404_NOT_FOUND)
-        return Response({'error': 'Incorrect password.'}, status=status.HTTP_401_UNAUTHORIZED)
+        try:
+            valid = password is not None and hashing.check_password(user, password)
+        except hashing.HashingBusy:
+            return hashing_busy_response()
+        if not valid or not user.is_active:
+            return Response({'error': 'Incorrect password.'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        refresh = RefreshToken.for_user(user)
+        return Response({
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+            'user': {'username': user.username, 'email': user.email}
+        })
+
+class ThrottledTokenObtainPairView(TokenObtainPairView):
+    throttle_scope = 'login'
+    throttle_key_fields = ('username',)
 
 class UserLogoutView(APIView):
     permission_classes = [IsAuthenticated]
@@ -98,11 +114,15 @@ class UserLogoutView(APIView):
 class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]
     def get(self, request):
-        user = request.user
-        return Response({'username': user.username, 'email': user.email})
+        # request.user only holds the cached principal; one query for the rest
+        user = User.objects.select_related('profile').only(
+            'username', 'email', 'profile__profile_image', 'profile__image_variants'
+        ).get(pk=request.user.pk)
+        return Response(UserSerializer(user, context={'request': request}).data)
 
 class PasswordResetRequestView(APIView):
     permission_classes = [AllowAny]
+    throttle_scope = 'password_reset'
     
     def post(self, request):
         email = request.data.get('email')
@@ -110,7 +130,7 @@ class PasswordResetRequestView(APIView):
             return Response({'error': 'Email is required'}, status=status.HTTP_400_BAD_REQUEST)
             
         try:
-            user = User.objects.get(email=email)
+            user = users_with_email(email).get()
             # Generate token
             token = default_token_generator.make_token(user)
             uid = urlsafe_base64_encode(force_bytes(user.pk))
@@ -127,6 +147,7 @@ class PasswordResetRequestView(APIView):
 
 class PasswordResetConfirmView(APIView):
     permission_classes = [AllowAny]
+    throttle_scope = 'password_reset'
     
     def post(self, request):
         uid = request.data.get('uid')
@@ -146,15 +167,17 @@ class PasswordResetConfirmView(APIView):
                 return Response({'error': 'Invalid or expired token'}, status=status.HTTP_400_BAD_REQUEST)
             
             # Check if new password is same as current password
-            if user.check_password(password):
+            if hashing.check_password(user, password):
                 return Response({'error': 'New password cannot be the same as your current password'}, status=status.HTTP_400_BAD_REQUEST)
             
             # Update the password
-            user.set_password(password)
+            hashing.set_password(user, password)
             user.save()
             
             return Response({'message': 'Password has been reset successfully'}, status=status.HTTP_200_OK)
             
+        except hashing.HashingBusy:
+            return hashing_busy_response()
         except (TypeError, ValueError, User.DoesNotExist):
             return Response({'error': 'Invalid user ID'}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
@@ -165,7 +188,9 @@ class ProfileUpdateView(APIView):
     parser_classes = [parsers.MultiPartParser, parsers.FormParser, parsers.JSONParser]
     
     def post(self, request):
-        user = request.user
+        # The whole row: the principal's deferred fields would each cost a query, and
+        # saving it would write back its cached, possibly stale, permission flags
+        user = User.objects.select_related('profile').get(pk=request.user.pk)
         username = request.data.get('username', '').strip()
         email = request.data.get('email', '').strip()
         old_password = request.data.get('old_password', '').strip()
@@ -180,6 +205,11 @@ class ProfileUpdateView(APIView):
         
         if not any([is_updating_username, is_updating_email, is_updating_password, is_updating_image]):
             return Response({'error': 'No fields to update'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Only the size is checked here; decoding and resizing happen in a worker
+        if is_updating_image and profile_image.size > settings.PROFILE_IMAGE_MAX_BYTES:
+            limit = settings.PROFILE_IMAGE_MAX_BYTES // (1024 * 1024)
+            return Response({'error': f'Profile image must be {limit} MB or smaller'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Validate and update username
         if is_updating_username:
@@ -194,7 +224,7 @@ class ProfileUpdateView(APIView):
         if is_updating_email:
             if not email or '@' not in email:
                 return Response({'error': 'Please enter a valid email address'}, status=status.HTTP_400_BAD_REQUEST)
-            if User.objects.filter(email=email).exclude(id=user.id).exists():
+            if users_with_email(email).exclude(id=user.id).exists():
                 return Response({'error': 'Email is already registered'}, status=status.HTTP_400_BAD_REQUEST)
             user.email = email
         # Validate and update password
@@ -205,11 +235,15 @@ class ProfileUpdateView(APIView):
                 return Response({'error': 'New password is required'}, status=status.HTTP_400_BAD_REQUEST)
             if len(new_password) < 8:
                 return Response({'error': 'Password must be at least 8 characters long'}, status=status.HTTP_400_BAD_REQUEST)
-            if not user.check_password(old_password):
-                return Response({'error': 'Current password is incorrect'}, status=status.HTTP_400_BAD_REQUEST)
-            if user.check_password(new_password):
-                return Response({'error': 'New password cannot be the same as current password'}, status=status.HTTP_400_BAD_REQUEST)
-            user.set_password(new_password)
+            try:
+                if not hashing.check_password(user, old_password):
+                    return Response({'error': 'Current password is incorrect'}, status=status.HTTP_400_BAD_REQUEST)
+                # old_password is verified, so comparing strings saves a second hash
+                if new_password == old_password:
+                    return Response({'error': 'New password cannot be the same as current password'}, status=status.HTTP_400_BAD_REQUEST)
+                hashing.set_password(user, new_password)
+            except hashing.HashingBusy:
+                return hashing_busy_response()
         # Save the user
         try:
             user.save()
@@ -229,13 +263,19 @@ class ProfileUpdateView(APIView):
             if is_updating_image:
                 updates.append('profile image')
             message = f"Successfully updated {', '.join(updates)}"
-            return Response({
+            data = {
                 'message': message,
                 'user': {
                     'username': user.username,
                     'email': user.email,
-                    'profile_image': user.profile.profile_image.url if hasattr(user, 'profile') and user.profile.profile_image else None
+                    'profile_image': user.profile.profile_image.url if hasattr(user, 'profile') and user.profile.profile_image else None,
+                    'profile_image_variants': UserSerializer(user, context={'request': request}).data['profile_image_variants']
                 }
-            }, status=status.HTTP_200_OK)
+            }
+            if is_updating_password:
+                # The new password revokes existing tokens, this one included
+                refresh = RefreshToken.for_user(user)
+                data.update({'refresh': str(refresh), 'access': str(refresh.access_token)})
+            return Response(data, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({'error': 'Failed to update profile'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR) 
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""
+JWT authentication that resolves the user from a short-lived principal cache
+instead of loading ``auth_user`` on every request.
+
+Tokens carry simplejwt's revoke claim (a hash of the password hash, enabled
+by CHECK_REVOKE_TOKEN), which serves as the user's auth version: the cached
+entry records the version it was built from, and any save or delete of the
+user drops the entry on every process, so a password change or
+deactivation takes effect on the next request.
+
+Only the fields permission checks read (PRINCIPAL_FIELDS) are cached, never
+the password hash; the request's user is rebuilt from them with every other
+field deferred, so a view that reads, say, ``email`` loads it on access.
+
+Revocation window: the drop reaches other processes' L1 over the tiered
+cache's invalidation bus. A process that misses the message keeps accepting
+a revoked token from its L1 copy for up to L1_TIMEOUT (30s), or, if the
+default cache isn't shared between processes (no REDIS_URL), for the whole
+PRINCIPAL_TIMEOUT.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from . import metrics
+
+PRINCIPAL_TIMEOUT = 300
+PRINCIPAL_FIELDS = ('is_active', 'is_staff', 'is_superuser')
+
+
+def principal_key(user_id):
+    return f'auth:principal:v2:{user_id}'
+
+
+def auth_version(user):
+    return get_md5_hash_password(user.password)
+
+
+def build_principal(fields):
+    """A user holding only ``fields``; the rest are deferred and load on access."""
+    User = get_user_model()
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in fields]
+    return User.from_db(DEFAULT_DB_ALIAS, names, [fields[name] for name in names])
+
+
+def get_principal(user_id):
+    """``(user, auth_version)`` for ``user_id``, or ``(None, None)``."""
+    cache = caches['tiered']
+    key = principal_key(user_id)
+    entry = cache.get(key)
+    metrics.cache_lookup('principal', entry is not None)
+    if entry is None:
+        User = get_user_model()
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None:
+            return None, None
+        fields = {name: getattr(user, name) for name in (User._meta.pk.attname, *PRINCIPAL_FIELDS)}
+        entry = (fields, auth_version(user))
+        cache.set(key, entry, PRINCIPAL_TIMEOUT)
+    fields, version = entry
+    return build_principal(fields), version
+
+
+def invalidate_principal(user_id):
+    transaction.on_commit(lambda: caches['tiered'].delete(principal_key(user_id)))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user, version = get_principal(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != version:
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
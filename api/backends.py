@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+
+def find_user(*identifiers):
+    """
+    The user whose username or email (case-insensitively) is the first of
+    ``identifiers`` to match anyone, in one query on the username and
+    LOWER(email) unique indexes.
+    """
+    identifiers = [identifier for identifier in identifiers if identifier]
+    if not identifiers:
+        return None
+    User = get_user_model()
+    matches = list(
+        User.objects.alias(email_lower=Lower('email'))
+        # email > '' restates the partial index's predicate so it can be used
+        .filter(
+            Q(username__in=identifiers)
+            | Q(email_lower__in=[identifier.lower() for identifier in identifiers], email__gt='')
+        )[:2 * len(identifiers)]
+    )
+    for identifier in identifiers:
+        # An exact username wins over someone else's email
+        for user in matches:
+            if user.username == identifier:
+                return user
+        for user in matches:
+            if user.email.lower() == identifier.lower():
+                return user
+    return None
+
+
+class EmailOrUsernameBackend(ModelBackend):
+    def authenticate(self, request, username=None, password=None, email=None, **kwargs):
+        if password is None:
+            return None
+        user = find_user(email, username or kwargs.get(get_user_model().USERNAME_FIELD))
+        if user is None:
+            # Hash anyway so response time doesn't reveal unknown accounts
+            get_user_model()().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,60 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.test.utils import override_settings
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """Run a benchmark inside a transaction that is always rolled back."""
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def unthrottled():
+    """Lift the API rate limits, which one benchmark client address would trip at once."""
+    rates = {scope: '1000000/min' for scope in settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']}
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates})
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        'count': len(samples),
+        'mean': statistics.fmean(samples) if samples else 0.0,
+        'p50': percentile(samples, 50),
+        'p95': percentile(samples, 95),
+        'p99': percentile(samples, 99),
+    }
+
+
+def format_summary(label, samples, unit='ms'):
+    stats = summarize(samples)
+    return (
+        f"{label:<28} n={stats['count']:<5} mean={stats['mean']:.2f}{unit} "
+        f"p50={stats['p50']:.2f}{unit} p95={stats['p95']:.2f}{unit} p99={stats['p99']:.2f}{unit}"
+    )
@@ -0,0 +1,243 @@
+"""
+Two-level cache: a per-process LRU (L1) in front of a shared cache alias
+(L2, Redis in production). Writes go through to L2 and are broadcast on an
+invalidation bus so other gunicorn workers drop their L1 copy.
+
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', ...},
+        'tiered': {
+            'BACKEND': 'api.cache.TieredCache',
+            'LOCATION': 'default',              # L2 alias
+            'OPTIONS': {
+                'L1_MAX_ENTRIES': 1000,
+                'L1_TIMEOUT': 30,               # upper bound on L1 staleness
+                'BUS_URL': 'redis://...',       # omit for the in-process bus
+            },
+        },
+    }
+"""
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+logger = logging.getLogger(__name__)
+
+CLEAR_ALL = '*'
+# Backends whose entries never leave the process
+PROCESS_LOCAL_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+class LRUStore:
+    """Thread-safe LRU of pickled values with per-entry expiry."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+        return pickle.loads(payload)
+
+    def set(self, key, value, timeout):
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, payload)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def evict(self, key):
+        with self._lock:
+            if key == CLEAR_ALL:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+
+class LocalBus:
+    """In-process invalidation bus; also the stand-in for Redis in tests."""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.stores = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, store):
+        with self._lock:
+            if store not in self.stores:
+                self.stores.append(store)
+
+    def publish(self, key, origin):
+        for store in list(self.stores):
+            if store is not origin:
+                store.evict(key)
+
+
+class RedisBus(LocalBus):
+    """Fans invalidations out to every process through Redis pub/sub."""
+
+    def __init__(self, channel, url):
+        super().__init__(channel)
+        self.url = url
+        self.node = uuid.uuid4().hex
+        self._client = None
+        self._thread = None
+        self._pid = None
+
+    def _ensure_listener(self):
+        # Threads don't survive gunicorn's fork, so (re)start per process
+        if self._pid == os.getpid():
+            return
+        import redis
+
+        self.node = uuid.uuid4().hex
+        self._client = redis.Redis.from_url(self.url)
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self.channel: self._on_message})
+        self._thread = pubsub.run_in_thread(sleep_time=1, daemon=True)
+        self._pid = os.getpid()
+
+    def _on_message(self, message):
+        try:
+            data = json.loads(message['data'])
+        except (TypeError, ValueError):
+            return
+        if data.get('node') == self.node:
+            return
+        for store in list(self.stores):
+            store.evict(data['key'])
+
+    def subscribe(self, store):
+        super().subscribe(store)
+        try:
+            self._ensure_listener()
+        except Exception as exc:
+            logger.warning('Could not subscribe to cache invalidations on %s: %s', self.channel, exc)
+
+    def publish(self, key, origin):
+        super().publish(key, origin)
+        try:
+            self._ensure_listener()
+            self._client.publish(self.channel, json.dumps({'node': self.node, 'key': key}))
+        except Exception as exc:
+            # Peers fall back to L1_TIMEOUT expiry; don't fail the write
+            logger.warning('Could not publish cache invalidation for %s: %s', key, exc)
+
+
+_stores = {}
+_buses = {}
+_registry_lock = threading.Lock()
+
+
+def get_bus(channel, url=None):
+    with _registry_lock:
+        bus = _buses.get((channel, url))
+        if bus is None:
+            bus = RedisBus(channel, url) if url else LocalBus(channel)
+            _buses[(channel, url)] = bus
+        return bus
+
+
+def get_store(name, max_entries):
+    with _registry_lock:
+        store = _stores.get(name)
+        if store is None:
+            store = _stores[name] = LRUStore(max_entries)
+        return store
+
+
+def is_process_local(alias='default'):
+    """True if other processes can't see ``alias`` (the LocMem fallback without REDIS_URL)."""
+    return settings.CACHES[alias]['BACKEND'] in PROCESS_LOCAL_BACKENDS
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = location or 'default'
+        self.l1_timeout = options.get('L1_TIMEOUT', 30)
+        name = options.get('L1_NAME', self._l2_alias)
+        self.l1 = get_store(name, options.get('L1_MAX_ENTRIES', 1000))
+        self.bus = get_bus(options.get('CHANNEL', f'cache-invalidate:{name}'), options.get('BUS_URL'))
+        self.bus.subscribe(self.l1)
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def _l1_timeout(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self.l1_timeout
+        return min(self.l1_timeout, max(timeout - time.time(), 0))
+
+    def _invalidate(self, key):
+        self.l1.evict(key)
+        self.bus.publish(key, self.l1)
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version)
+        value = self.l1.get(local_key)
+        if value is not None:
+            return value
+        value = self.l2.get(key, version=version)
+        if value is None:
+            return default
+        self.l1.set(local_key, value, self.l1_timeout)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version)
+        self.l2.set(key, value, timeout=timeout, version=version)
+        self._invalidate(local_key)
+        self.l1.set(local_key, value, self._l1_timeout(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self.l2.add(key, value, timeout=timeout, version=version):
+            return False
+        local_key = self.make_and_validate_key(key, version)
+        self._invalidate(local_key)
+        self.l1.set(local_key, value, self._l1_timeout(timeout))
+        return True
+
+    def delete(self, key, version=None):
+        deleted = self.l2.delete(key, version=version)
+        self._invalidate(self.make_and_validate_key(key, version))
+        return deleted
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout=timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.l2.incr(key, delta, version=version)
+        self._invalidate(self.make_and_validate_key(key, version))
+        return value
+
+    def has_key(self, key, version=None):
+        return self.get(key, version=version) is not None
+
+    def clear(self):
+        self.l2.clear()
+        self._invalidate(CLEAR_ALL)
@@ -0,0 +1,137 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Cart, CartItem, DeliveryType, GiftDetails, Order, OrderItem
+
+
+class EmptyCartError(Exception):
+    pass
+
+
+def snapshot_cart_lines(user):
+    """
+    Cart lines for ``user`` priced at the current meal price, in one query.
+    """
+    lines = list(
+        CartItem.objects.filter(cart__user=user)
+        .order_by('id')
+        .values(
+            'id', 'cart_id', 'meal_id', 'quantity', 'portions', 'plates',
+            'special_instructions', 'meal__price',
+        )
+    )
+    for line in lines:
+        line['total_price'] = line['meal__price'] * line['quantity'] * line['portions'] * line['plates']
+    return lines
+
+
+def reserve_order(user, serializer, delivery_type):
+    """
+    Fast path of checkout: price and empty the cart and record an 'accepted'
+    order holding the line snapshot. Order items, gift details and the
+    payment intent are left to the ``process_order`` task, which is queued
+    once this commits.
+    """
+    from .tasks import process_order
+
+    with transaction.atomic():
+        # Write first: this row-locks the cart against a concurrent checkout,
+        # and on SQLite takes the write lock up front so we queue on the busy
+        # timeout instead of failing a read->write lock upgrade.
+        if not Cart.objects.filter(user=user).update(updated_at=timezone.now()):
+            raise EmptyCartError
+        lines = snapshot_cart_lines(user)
+        if not lines:
+            raise EmptyCartError
+
+        subtotal = sum(line['total_price'] for line in lines)
+        # The cached row may predate a price change made in another process
+        delivery_price = DeliveryType.objects.filter(pk=delivery_type.pk).values_list('price', flat=True).get()
+        gift_details = serializer.validated_data.pop('gift_details', None)
+        order = serializer.save(
+            user=user,
+            total_amount=subtotal + delivery_price,
+            status='accepted',
+            pending_checkout={
+                'lines': [
+                    {
+                        'meal_id': line['meal_id'],
+                        'quantity': line['quantity'],
+                        'portions': line['portions'],
+                        'plates': line['plates'],
+                        'special_instructions': line['special_instructions'],
+                        'unit_price': str(line['meal__price']),
+                        'total_price': str(line['total_price']),
+                    }
+                    for line in lines
+                ],
+                'gift_details': gift_details,
+            },
+        )
+
+        # Only the lines we priced; anything added meanwhile stays in the cart
+        CartItem.objects.filter(id__in=[line['id'] for line in lines]).delete()
+        Cart.objects.filter(pk=lines[0]['cart_id']).recalculate_totals()
+        transaction.on_commit(lambda: process_order.delay(order.pk))
+    return order
+
+
+def unprocessed_orders():
+    """
+    Orders ``process_order`` hasn't finished: not yet materialized or, with
+    payment intents on, pending without an intent to pay.
+    """
+    condition = Q(status='accepted')
+    if settings.PAYMENT_INTENTS_ENABLED:
+        condition |= Q(status='pending', payment_intent_id='')
+    return Order.objects.filter(condition)
+
+
+def cancel_unprocessed_order(order_id):
+    """Cancel an order the worker never finished; False if it has moved on."""
+    with transaction.atomic():
+        order = unprocessed_orders().select_for_update().filter(pk=order_id).first()
+        if order is None:
+            return False
+        # The snapshot stays on the order, so support can still see what was in the cart
+        order.status = 'cancelled'
+        order.save(update_fields=['status', 'updated_at'])
+    return True
+
+
+def materialize_order(order_id):
+    """
+    Turn an accepted order's snapshot into order items (one bulk insert) and
+    gift details, and move it to 'pending'. Safe to run more than once.
+    """
+    with transaction.atomic():
+        order = Order.objects.select_for_update().get(pk=order_id)
+        if order.status != 'accepted' or order.pending_checkout is None:
+            return order
+
+        # bulk_create skips OrderItem.save(), so totals come from the snapshot
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                meal_id=line['meal_id'],
+                quantity=line['quantity'],
+                portions=line['portions'],
+                plates=line['plates'],
+                special_instructions=line['special_instructions'],
+                unit_price=Decimal(line['unit_price']),
+                total_price=Decimal(line['total_price']),
+            )
+            for line in order.pending_checkout['lines']
+        ])
+        gift_details = order.pending_checkout.get('gift_details')
+        if gift_details and order.is_gift:
+            order.gift_details = GiftDetails.objects.create(**gift_details)
+
+        order.status = 'pending'
+        order.pending_checkout = None
+        order.save(update_fields=['gift_details', 'status', 'pending_checkout', 'updated_at'])
+    return order
@@ -0,0 +1,20 @@
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.checks import Warning, register
+
+
+@register()
+def static_manifest_check(app_configs, **kwargs):
+    """Outside DEBUG, static files need ``collectstatic`` to have run."""
+    if settings.DEBUG:
+        return []
+    manifest_name = getattr(staticfiles_storage, 'manifest_name', None)
+    if manifest_name is None or os.path.exists(os.path.join(settings.STATIC_ROOT, manifest_name)):
+        return []
+    return [Warning(
+        f'No static files manifest in {settings.STATIC_ROOT}; pages fall back to unhashed, uncompressed assets.',
+        hint='Run "python manage.py collectstatic --noinput" as part of every deploy.',
+        id='api.W001',
+    )]
@@ -0,0 +1,141 @@
+"""
+Concurrent, disk-cached HTTP downloads for the seeding commands.
+
+URLs are deduplicated and fetched by a bounded thread pool over one
+keep-alive session. Bodies are cached on disk by URL along with their
+``ETag``/``Last-Modified``: entries younger than ``max_age`` are used
+without a request, older ones are revalidated with a conditional GET.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+def default_cache_dir():
+    root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(root, 'foodapp', 'downloads')
+
+
+class Download:
+    def __init__(self, url):
+        self.url = url
+        self.content = None
+        # 'network', 'revalidated' (304), 'cache', or 'error'
+        self.source = 'error'
+        self.error = ''
+        self.seconds = 0.0
+
+    @property
+    def ok(self):
+        return self.content is not None
+
+
+class Fetcher:
+    def __init__(self, cache_dir=None, workers=8, timeout=(5, 20), max_age=86400, retries=2):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.timeout = timeout
+        self.max_age = max_age
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def fetch_all(self, urls):
+        """``{url: Download}`` for the distinct ``urls``, fetched concurrently."""
+        unique = list(dict.fromkeys(urls))
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return dict(zip(unique, pool.map(self.fetch, unique)))
+
+    def fetch(self, url):
+        started = time.monotonic()
+        download = Download(url)
+        cached = self.read_cache(url)
+        if cached and time.time() - cached['fetched_at'] < self.max_age:
+            download.content, download.source = cached['content'], 'cache'
+            download.seconds = time.monotonic() - started
+            return download
+
+        headers = {}
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and cached:
+                download.content, download.source = cached['content'], 'revalidated'
+                self.write_cache(url, None, cached)
+            else:
+                response.raise_for_status()
+                download.content, download.source = response.content, 'network'
+                self.write_cache(url, response.content, {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                })
+        except requests.RequestException as exc:
+            download.error = str(exc)
+            logger.warning('Download of %s failed: %s', url, exc)
+        download.seconds = time.monotonic() - started
+        return download
+
+    def cache_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest())
+
+    def read_cache(self, url):
+        if not self.cache_dir:
+            return None
+        path = self.cache_path(url)
+        try:
+            with open(f'{path}.json') as file:
+                meta = json.load(file)
+            with open(path, 'rb') as file:
+                meta['content'] = file.read()
+        except (OSError, ValueError):
+            return None
+        return meta
+
+    def write_cache(self, url, content, meta):
+        # content=None refreshes the metadata of a revalidated entry
+        if not self.cache_dir:
+            return
+        path = self.cache_path(url)
+        meta = {
+            'url': url,
+            'etag': meta.get('etag'),
+            'last_modified': meta.get('last_modified'),
+            'fetched_at': time.time(),
+        }
+        # Body first, then metadata, each by atomic rename: a reader never
+        # pairs new metadata with a half-written body
+        writes = [(f'{path}.json', json.dumps(meta).encode())]
+        if content is not None:
+            writes.insert(0, (path, content))
+        for target, data in writes:
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir)
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(temp_path, target)
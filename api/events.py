@@ -0,0 +1,170 @@
+"""
+Fan-out of order status changes to server-sent-event streams.
+
+Order saves publish ``{id, status, updated_at}`` for the order's owner once
+the transaction commits. Each process keeps one asyncio queue per open
+stream; with ORDER_EVENTS_URL (Redis) set, events are relayed through
+pub/sub so a change made in a worker or another web process reaches streams
+held anywhere.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'order-status'
+# Nothing moves past these, so a stream watching only them can end
+FINAL_STATUSES = {'delivered', 'cancelled'}
+
+
+class Subscription:
+    def __init__(self, hub, user_id, maxsize=100):
+        self.hub = hub
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def deliver(self, event):
+        # The stream's loop may be gone (ASGI server shutting down) before it unsubscribed
+        if self.loop.is_closed():
+            self.close()
+            return
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        # A client that stops reading loses events rather than growing memory;
+        # it catches up from the snapshot when it reconnects
+        if not self.queue.full():
+            self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class LocalHub:
+    """Delivers events to the streams open in this process."""
+
+    def __init__(self):
+        self.subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            self.subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self.subscribers.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscribers.pop(subscription.user_id, None)
+
+    def dispatch(self, user_id, event):
+        with self._lock:
+            subscriptions = list(self.subscribers.get(user_id, ()))
+        for subscription in subscriptions:
+            # Runs in on_commit after the order is saved; one bad stream mustn't fail the request
+            try:
+                subscription.deliver(event)
+            except Exception:
+                logger.exception('Could not deliver order event to a stream of user %s', user_id)
+
+    def publish(self, user_id, event):
+        self.dispatch(user_id, event)
+
+
+class RedisHub(LocalHub):
+    """Relays events between processes through Redis pub/sub."""
+
+    def __init__(self, url, channel=CHANNEL):
+        super().__init__()
+        self.url = url
+        self.channel = channel
+        self._client = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        # Threads don't survive gunicorn's fork, so (re)start per process
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            import redis
+
+            self._client = redis.Redis.from_url(self.url)
+            pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: self._on_message})
+            pubsub.run_in_thread(sleep_time=1, daemon=True)
+            self._pid = os.getpid()
+
+    def _on_message(self, message):
+        try:
+            data = json.loads(message['data'])
+        except (TypeError, ValueError):
+            return
+        self.dispatch(data['user_id'], data['event'])
+
+    def subscribe(self, user_id):
+        subscription = super().subscribe(user_id)
+        try:
+            self._ensure_listener()
+        except Exception as exc:
+            logger.warning('Could not subscribe to order events on %s: %s', self.channel, exc)
+        return subscription
+
+    def publish(self, user_id, event):
+        try:
+            self._ensure_listener()
+            # Comes back to this process through the listener like everyone else's
+            self._client.publish(self.channel, json.dumps({'user_id': user_id, 'event': event}))
+        except Exception as exc:
+            logger.warning('Could not publish order event, delivering locally only: %s', exc)
+            self.dispatch(user_id, event)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            url = getattr(settings, 'ORDER_EVENTS_URL', None)
+            _hub = RedisHub(url) if url else LocalHub()
+        return _hub
+
+
+def order_event(order):
+    return {
+        'id': order.pk,
+        'status': order.status,
+        'updated_at': order.updated_at.isoformat() if order.updated_at else None,
+    }
+
+
+def publish_order_status(order):
+    event = order_event(order)
+    user_id = order.user_id
+    transaction.on_commit(lambda: get_hub().publish(user_id, event))
+
+
+def format_event(event, name='status'):
+    return f'id: {event["id"]}:{event["updated_at"]}\nevent: {name}\ndata: {json.dumps(event)}\n\n'
@@ -0,0 +1,66 @@
+"""
+Password hashing in a small bounded thread pool.
+
+PBKDF2 is CPU-bound and releases the GIL, so a login burst can saturate
+every core. Hashing runs on at most PASSWORD_HASH_WORKERS threads per
+process, and no more than PASSWORD_HASH_BACKLOG calls may wait. Past that,
+HashingBusy is raised and the view answers 503 instead of queueing.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password as check_encoded, get_hasher, identify_hasher, make_password
+
+
+class HashingBusy(Exception):
+    pass
+
+
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            workers = settings.PASSWORD_HASH_WORKERS
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+            _slots = threading.BoundedSemaphore(workers + settings.PASSWORD_HASH_BACKLOG)
+        return _pool, _slots
+
+
+def run(func, *args):
+    pool, slots = _get_pool()
+    if not slots.acquire(timeout=settings.PASSWORD_HASH_TIMEOUT):
+        raise HashingBusy
+    try:
+        return pool.submit(func, *args).result()
+    finally:
+        slots.release()
+
+
+def needs_rehash(encoded):
+    """Whether ``encoded`` was made by another hasher, or with weaker settings, than the preferred one."""
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    preferred = get_hasher('default')
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def check_password(user, raw_password):
+    # The pool threads only hash; saving happens here, as User.check_password's setter would
+    valid = run(check_encoded, raw_password, user.password)
+    if valid and needs_rehash(user.password):
+        set_password(user, raw_password)
+        user.save(update_fields=['password'])
+    return valid
+
+
+def set_password(user, raw_password):
+    user.password = run(make_password, raw_password)
+    user._password = raw_password
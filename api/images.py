@@ -0,0 +1,115 @@
+"""
+Resized, EXIF-stripped JPEG and WebP variants of uploaded images.
+
+Variants are saved through the content-addressed default storage
+(api/storage.py), so re-processing an image, or two identical uploads,
+store each file once.
+Decoding happens here, in the worker, never in the request that accepted
+the upload.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+
+
+class InvalidImage(Exception):
+    pass
+
+
+def open_image(file):
+    """Decode ``file`` upright, as RGB or RGBA; raises InvalidImage."""
+    try:
+        image = Image.open(file)
+        # The header is enough to refuse decompression bombs before decoding
+        if image.width * image.height > settings.IMAGE_MAX_PIXELS:
+            raise InvalidImage(f'{image.width}x{image.height} is too large')
+        image.load()
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        raise InvalidImage(str(exc))
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def flatten(image):
+    if image.mode != 'RGBA':
+        return image
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def store(data, prefix, extension):
+    return default_storage.save(f'{prefix}/variant.{extension}', ContentFile(data))
+
+
+def build_variants(file, sizes, prefix):
+    """
+    Render ``sizes`` ({label: longest edge in px}) of ``file`` as JPEG and
+    WebP. Images are never upscaled. Returns
+    ``{label: {'width', 'height', 'jpeg': name, 'webp': name}}``.
+    """
+    source = open_image(file)
+    variants = {}
+    for label, edge in sizes.items():
+        image = source.copy()
+        image.thumbnail((edge, edge), Image.LANCZOS)
+        entry = {'width': image.width, 'height': image.height}
+        for key, (pil_format, extension, options) in FORMATS.items():
+            buffer = BytesIO()
+            # Pillow writes no EXIF unless asked to, which strips GPS and camera data
+            (image if pil_format == 'WEBP' else flatten(image)).save(buffer, pil_format, **options)
+            entry[key] = store(buffer.getvalue(), prefix, extension)
+        variants[label] = entry
+    return variants
+
+
+def current_variants(field_file, variants):
+    """
+    The ``sizes`` of ``variants`` ({'source': name, 'sizes': {...}}) if they
+    were made from ``field_file``; a replaced image's variants are stale.
+    """
+    if field_file and variants.get('source') == field_file.name:
+        return variants['sizes']
+    return {}
+
+
+def srcset(variants, request=None):
+    """{'jpeg': 'url 300w, url 768w, ...', 'webp': ...} for an <img srcset>."""
+    entries = sorted(variant_urls(variants, request).values(), key=lambda entry: entry['width'])
+    if not entries:
+        return {}
+    return {key: ', '.join(f"{entry[key]} {entry['width']}w" for entry in entries) for key in FORMATS}
+
+
+def variant_names(variants):
+    """Every stored file in ``variants``, current or not."""
+    return {
+        entry[key]
+        for entry in variants.get('sizes', {}).values()
+        for key in FORMATS if key in entry
+    }
+
+
+def variant_urls(variants, request=None):
+    """Variant map with storage names swapped for (absolute) URLs."""
+    def url(name):
+        path = default_storage.url(name)
+        return request.build_absolute_uri(path) if request is not None else path
+
+    return {
+        label: {
+            'width': entry['width'],
+            'height': entry['height'],
+            **{key: url(entry[key]) for key in FORMATS},
+        }
+        for label, entry in variants.items()
+    }
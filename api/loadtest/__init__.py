@@ -0,0 +1,12 @@
+"""
+End-to-end load testing of the browse -> cart -> checkout journey.
+
+``python manage.py loadtest`` runs virtual users that each register, log in,
+browse the menu, fill a cart, check out and poll the order, either
+in-process or over HTTP against a running server, and reports latency
+percentiles and throughput per endpoint. A stored baseline turns it into a
+regression check.
+"""
+from .baseline import compare, load_baseline, save_baseline
+from .journeys import JourneyFailed, shopper
+from .runner import Recorder, run
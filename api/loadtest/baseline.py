@@ -0,0 +1,40 @@
+import json
+
+# Latencies this close to the baseline are noise, whatever the ratio
+LATENCY_SLACK_MS = 5.0
+
+
+def save_baseline(path, endpoints, meta):
+    with open(path, 'w') as file:
+        json.dump({
+            'meta': meta,
+            'endpoints': {
+                name: {key: round(stats[key], 3) for key in ('p50', 'p95', 'p99', 'rps', 'error_rate')}
+                for name, stats in endpoints.items()
+            },
+        }, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+def load_baseline(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def compare(baseline, endpoints, tolerance):
+    """Regressions of ``endpoints`` against ``baseline``, as readable strings."""
+    regressions = []
+    for name, base in baseline['endpoints'].items():
+        current = endpoints.get(name)
+        if current is None or not current['count']:
+            regressions.append(f'{name}: no successful requests')
+            continue
+        for key in ('p95', 'p99'):
+            limit = base[key] * (1 + tolerance) + LATENCY_SLACK_MS
+            if current[key] > limit:
+                regressions.append(f'{name}: {key} {current[key]:.1f}ms > {limit:.1f}ms (baseline {base[key]:.1f}ms)')
+        if current['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{name}: {current['rps']:.1f} req/s < baseline {base['rps']:.1f} req/s")
+        if current['error_rate'] > base['error_rate'] + 0.01:
+            regressions.append(f"{name}: error rate {current['error_rate']:.1%} (baseline {base['error_rate']:.1%})")
+    return regressions
@@ -0,0 +1,80 @@
+import json
+import time
+
+SEARCHES = ['rice', 'jollof', 'yam', 'soup', 'beans']
+
+
+class JourneyFailed(Exception):
+    pass
+
+
+class Session:
+    """One virtual user's requests, timed and recorded under an endpoint name."""
+
+    def __init__(self, transport, recorder, rng):
+        self.transport = transport
+        self.recorder = recorder
+        self.rng = rng
+        self.headers = {}
+
+    def call(self, name, method, url, data=None, expect=200):
+        started = time.perf_counter()
+        try:
+            status, content = self.transport.request(method, url, data, self.headers)
+        except Exception as exc:
+            self.recorder.error(name, type(exc).__name__)
+            raise JourneyFailed(f'{name}: {exc}')
+        elapsed = (time.perf_counter() - started) * 1000
+        if status != expect:
+            self.recorder.error(name, status)
+            raise JourneyFailed(f'{name}: HTTP {status} {content[:200]!r}')
+        self.recorder.sample(name, elapsed)
+        return json.loads(content) if content else None
+
+
+def sign_up(session, username, password):
+    """Register and log in; later requests carry the access token."""
+    email = f'{username}@loadtest.example.com'
+    session.call('register', 'POST', '/api/auth/registration/', {
+        'username': username, 'email': email, 'password': password,
+    }, expect=201)
+    tokens = session.call('login', 'POST', '/api/auth/login/', {'email': email, 'password': password})
+    session.headers = {'Authorization': f"Bearer {tokens['access']}"}
+
+
+def shopper(session, options):
+    """Browse the menu, fill a cart, check out and poll the order until the worker has it."""
+    rng = session.rng
+    page = session.call('meals', 'GET', '/api/meals/?page_size=20')
+    meals = page['results']
+    if page.get('next') and rng.random() < 0.5:
+        meals += session.call('meals next page', 'GET', page['next'])['results']
+    session.call('meal search', 'GET', f'/api/meals/?search={rng.choice(SEARCHES)}')
+    if not meals:
+        raise JourneyFailed('no meals to order')
+
+    delivery_types = session.call('delivery types', 'GET', '/api/delivery-types/')
+    locations = session.call('locations', 'GET', '/api/locations/')
+    for meal in rng.sample(meals, min(len(meals), rng.randint(1, options['cart_lines']))):
+        session.call('cart add', 'POST', '/api/cart/', {
+            'meal_id': meal['id'], 'quantity': rng.randint(1, 3),
+        }, expect=201)
+        think(options)
+    session.call('cart', 'GET', '/api/cart/')
+
+    order = session.call('checkout', 'POST', '/api/orders/', {
+        'delivery_type_id': rng.choice(delivery_types)['id'],
+        'location_id': rng.choice(locations)['id'],
+    }, expect=202)['order']
+    for _ in range(options['max_polls']):
+        if order['status'] != 'accepted':
+            break
+        time.sleep(options['poll_interval'])
+        order = session.call('order status', 'GET', f"/api/orders/{order['id']}/")
+    else:
+        raise JourneyFailed(f"order {order['id']} still accepted after {options['max_polls']} polls")
+
+
+def think(options):
+    if options['think_time']:
+        time.sleep(options['think_time'])
@@ -0,0 +1,94 @@
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from ..benchmarking import format_summary, summarize
+from .journeys import JourneyFailed, Session, shopper, sign_up
+
+
+class Recorder:
+    """Latency samples and error counts per endpoint name, shared by all virtual users."""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.journeys = Counter()
+        self.failures = []
+        self.wall = 0.0
+        self._lock = threading.Lock()
+
+    def sample(self, name, elapsed):
+        with self._lock:
+            self.samples.setdefault(name, []).append(elapsed)
+
+    def error(self, name, kind):
+        with self._lock:
+            self.errors.setdefault(name, Counter())[kind] += 1
+
+    def journey(self, outcome, reason=None):
+        with self._lock:
+            self.journeys[outcome] += 1
+            if reason and len(self.failures) < 5:
+                self.failures.append(reason)
+
+    def endpoints(self):
+        """``{name: {count, mean, p50, p95, p99, rps, errors, error_rate}}``."""
+        stats = {}
+        for name in dict.fromkeys([*self.samples, *self.errors]):
+            samples = self.samples.get(name, [])
+            errors = sum(self.errors.get(name, {}).values())
+            stats[name] = {
+                **summarize(samples),
+                'rps': len(samples) / self.wall if self.wall else 0.0,
+                'errors': errors,
+                'error_rate': errors / (len(samples) + errors),
+            }
+        return stats
+
+    def report(self):
+        lines = []
+        for name, stats in self.endpoints().items():
+            errors = ', '.join(f'{kind}: {count}' for kind, count in self.errors.get(name, {}).items())
+            lines.append(
+                format_summary(name, self.samples.get(name, []))
+                + f" rps={stats['rps']:.1f} errors={stats['errors']}" + (f' ({errors})' if errors else '')
+            )
+        done = self.journeys['completed']
+        lines.append(
+            f"journeys: {done} completed, {self.journeys['failed']} failed in {self.wall:.1f}s "
+            f"({done / self.wall if self.wall else 0:.1f}/s)"
+        )
+        lines += [f'  failure: {reason}' for reason in self.failures]
+        return '\n'.join(lines)
+
+
+def run(make_transport, users, iterations, options, prefix, seed=42):
+    """Run ``users`` concurrent virtual users, each signing up once and then shopping ``iterations`` times."""
+    recorder = Recorder()
+
+    def virtual_user(index):
+        transport = make_transport()
+        session = Session(transport, recorder, random.Random(seed * 100003 + index))
+        try:
+            try:
+                sign_up(session, f'{prefix}{index}', options['password'])
+            except JourneyFailed as exc:
+                recorder.journey('failed', str(exc))
+                return
+            for _ in range(iterations):
+                try:
+                    shopper(session, options)
+                except JourneyFailed as exc:
+                    recorder.journey('failed', str(exc))
+                else:
+                    recorder.journey('completed')
+        finally:
+            transport.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        list(pool.map(virtual_user, range(users)))
+    recorder.wall = time.perf_counter() - started
+    return recorder
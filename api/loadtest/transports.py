@@ -0,0 +1,47 @@
+import json
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from django.db import connections
+from django.test import Client
+
+
+class HTTPTransport:
+    """Requests to a running server over one keep-alive session per virtual user."""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/') + '/'
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def request(self, method, url, data=None, headers=None):
+        response = self.session.request(
+            method, urljoin(self.base_url, url.lstrip('/') if not urlsplit(url).scheme else url),
+            json=data, headers=headers, timeout=self.timeout,
+        )
+        return response.status_code, response.content
+
+    def close(self):
+        self.session.close()
+
+
+class InProcessTransport:
+    """Requests through Django's handler in this process, against the configured database."""
+
+    def __init__(self):
+        # Server errors come back as 500s, as they would over HTTP
+        self.client = Client(SERVER_NAME='localhost', raise_request_exception=False)
+
+    def request(self, method, url, data=None, headers=None):
+        parts = urlsplit(url)
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        response = self.client.generic(
+            method, path, json.dumps(data) if data is not None else '',
+            content_type='application/json', headers=headers,
+        )
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, content
+
+    def close(self):
+        # Each virtual user's thread opened its own connection
+        connections.close_all()
@@ -0,0 +1,88 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections
+from rest_framework.test import APIClient
+
+from api.benchmarking import format_summary
+from api.models import Cart, CartItem, DeliveryType, Location, Meal, Order
+
+USER_PREFIX = 'bench-checkout-'
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark POST /api/orders/ latency against cart size with concurrent checkouts. '
+        'Writes (and then deletes) real rows, so point it at a scratch database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,10,30,60', help='Comma-separated cart sizes')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        concurrency = options['concurrency']
+        self.reported_error = False
+        created_meals = []
+        users = []
+        try:
+            delivery_type, _ = DeliveryType.objects.get_or_create(name='regular', defaults={'price': 500})
+            location, _ = Location.objects.get_or_create(name='hall1')
+            meals = list(Meal.objects.all()[:max(sizes)])
+            for i in range(len(meals), max(sizes)):
+                created_meals.append(Meal.objects.create(
+                    name=f'Bench Meal {i}', description='Checkout benchmark', price=1000, image='meals/default.jpg'
+                ))
+            meals += created_meals
+            users = [
+                User.objects.create_user(f'{USER_PREFIX}{i}', password=None)
+                for i in range(concurrency)
+            ]
+            payload = {'delivery_type_id': delivery_type.id, 'location_id': location.id}
+
+            for size in sizes:
+                samples, failures = [], 0
+                started = time.perf_counter()
+                for _ in range(options['rounds']):
+                    self.fill_carts(users, meals[:size])
+                    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                        results = list(pool.map(lambda user: self.checkout(user, payload), users))
+                    samples += [elapsed for elapsed, ok in results if ok]
+                    failures += sum(1 for _, ok in results if not ok)
+                wall = time.perf_counter() - started
+                self.stdout.write(
+                    format_summary(f'cart size {size}', samples)
+                    + f' errors={failures} throughput={len(samples) / wall:.1f}/s'
+                )
+        finally:
+            Order.objects.filter(user__username__startswith=USER_PREFIX).delete()
+            User.objects.filter(username__startswith=USER_PREFIX).delete()
+            Meal.objects.filter(id__in=[meal.id for meal in created_meals]).delete()
+
+    def fill_carts(self, users, meals):
+        # Failed checkouts leave their lines behind
+        CartItem.objects.filter(cart__user__in=users).delete()
+        for user in users:
+            cart, _ = Cart.objects.get_or_create(user=user)
+            CartItem.objects.bulk_create([
+                CartItem(cart=cart, meal=meal, quantity=2, total_price=meal.price * 2) for meal in meals
+            ])
+        Cart.objects.filter(user__in=users).recalculate_totals()
+
+    def checkout(self, user, payload):
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        try:
+            started = time.perf_counter()
+            response = client.post('/api/orders/', payload, format='json')
+            elapsed = (time.perf_counter() - started) * 1000
+            if response.status_code != 202 and not self.reported_error:
+                self.reported_error = True
+                self.stderr.write(f'First failed checkout: {response.status_code} {response.content[:200]!r}')
+            return elapsed, response.status_code == 202
+        finally:
+            connections.close_all()
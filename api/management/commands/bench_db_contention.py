@@ -0,0 +1,158 @@
+import copy
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from rest_framework.test import APIClient
+
+from api.benchmarking import unthrottled
+from api.loadtest import Recorder
+from api.models import DeliveryType, Location, Meal, Order
+
+USER_PREFIX = 'bench-contention-'
+
+
+@contextmanager
+def sqlite_defaults():
+    """Run with Django's stock SQLite setup: rollback journal, deferred transactions, 5s timeout."""
+    configured = connections.settings
+    stock = copy.deepcopy(configured[DEFAULT_DB_ALIAS])
+    stock['OPTIONS'] = {}
+    # New connections, on every thread, are built from a copy; the configured dict is left alone
+    connections.close_all()
+    del connections[DEFAULT_DB_ALIAS]
+    connections.settings = {**configured, DEFAULT_DB_ALIAS: stock}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=DELETE')
+        yield
+    finally:
+        connections.close_all()
+        del connections[DEFAULT_DB_ALIAS]
+        connections.settings = configured
+
+
+class Command(BaseCommand):
+    help = (
+        'Concurrent cart writers and checkouts, with readers alongside, against the configured database '
+        '(set DATABASE_URL to compare backends). Writes (and then deletes) real rows, so point it at a '
+        'scratch database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='Users adding to their carts and checking out')
+        parser.add_argument('--readers', type=int, default=2, help='Users reading order history meanwhile')
+        parser.add_argument('--rounds', type=int, default=10, help='Checkouts per writer')
+        parser.add_argument('--lines', type=int, default=3, help='Cart additions before each checkout')
+        parser.add_argument(
+            '--compare-defaults', action='store_true',
+            help="SQLite only: run first with Django's stock settings, then with the configured ones",
+        )
+
+    def handle(self, *args, **options):
+        meals = list(Meal.objects.filter(is_available=True).values_list('id', flat=True)[:options['lines']])
+        created_meal = None
+        if not meals:
+            created_meal = Meal.objects.create(
+                name='Contention Meal', description='Contention benchmark', price=1000, image='meals/default.jpg'
+            )
+            meals = [created_meal.id]
+        delivery_type, _ = DeliveryType.objects.get_or_create(name='regular', defaults={'price': 500})
+        location, _ = Location.objects.get_or_create(name='hall1')
+        self.payload = {'delivery_type_id': delivery_type.id, 'location_id': location.id}
+        self.meals = meals
+        count = options['writers'] + options['readers']
+        users = [User.objects.create_user(f'{USER_PREFIX}{index}', password=None) for index in range(count)]
+        # Lock errors are counted in the report; their tracebacks would drown it
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        try:
+            with unthrottled():
+                if options['compare_defaults'] and connection.vendor == 'sqlite':
+                    with sqlite_defaults():
+                        self.run(users, options, 'stock settings')
+                self.run(users, options, 'configured settings')
+        finally:
+            request_logger.setLevel(level)
+            Order.objects.filter(user__username__startswith=USER_PREFIX).delete()
+            User.objects.filter(username__startswith=USER_PREFIX).delete()
+            if created_meal is not None:
+                created_meal.delete()
+            connections.close_all()
+
+    def describe(self):
+        settings_dict = connection.settings_dict
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                pragmas = {
+                    pragma: cursor.execute(f'PRAGMA {pragma}').fetchone()[0]
+                    for pragma in ('journal_mode', 'synchronous', 'busy_timeout')
+                }
+            return ', '.join(
+                [f'{key}={value}' for key, value in pragmas.items()]
+                + [f'transaction_mode={connection.transaction_mode or "DEFERRED"}']
+            )
+        pool = settings_dict['OPTIONS'].get('pool')
+        return f"{connection.vendor}, CONN_MAX_AGE={settings_dict['CONN_MAX_AGE']}, pool={pool or 'off'}"
+
+    def run(self, users, options, label):
+        self.stdout.write(f'{label}: {self.describe()}')
+        recorder = Recorder()
+        writers, readers = users[:options['writers']], users[options['writers']:]
+        done = threading.Event()
+
+        def writer(user):
+            client = self.client(user)
+            try:
+                for _ in range(options['rounds']):
+                    for meal_id in self.meals:
+                        self.call(recorder, 'cart add', client.post, '/api/cart/', {'meal_id': meal_id}, 201)
+                    if self.call(recorder, 'checkout', client.post, '/api/orders/', self.payload, 202):
+                        recorder.journey('completed')
+                    else:
+                        recorder.journey('failed')
+            finally:
+                connections.close_all()
+
+        def reader(user):
+            client = self.client(user)
+            try:
+                while not done.is_set():
+                    self.call(recorder, 'order history', client.get, '/api/orders/', None, 200)
+                    self.call(recorder, 'cart read', client.get, '/api/cart/', None, 200)
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(users)) as pool:
+            reads = [pool.submit(reader, user) for user in readers]
+            list(pool.map(writer, writers))
+            done.set()
+            for future in reads:
+                future.result()
+        recorder.wall = time.perf_counter() - started
+        self.stdout.write(recorder.report())
+
+    def client(self, user):
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        return client
+
+    def call(self, recorder, name, method, url, data, expect):
+        started = time.perf_counter()
+        try:
+            response = method(url, data, format='json') if data is not None else method(url)
+        except Exception as exc:
+            recorder.error(name, str(exc).splitlines()[0][:60] or type(exc).__name__)
+            return False
+        if response.status_code != expect:
+            recorder.error(name, str(response.status_code))
+            return False
+        recorder.sample(name, (time.perf_counter() - started) * 1000)
+        return True
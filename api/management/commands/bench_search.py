@@ -0,0 +1,80 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from api.benchmarking import format_summary, rolled_back, timed
+from api.menu import bump_menu_version
+from api.models import Meal
+from api.search import search_meals
+
+DISHES = [
+    'Jollof Rice', 'Fried Rice', 'Pounded Yam', 'Amala', 'Eba', 'Semo', 'Fufu',
+    'Beans', 'Yam Porridge', 'Rice and Beans', 'Moi Moi', 'Ofada Rice',
+    'Egusi Soup', 'Efo Riro', 'Suya', 'Asun', 'Plantain', 'Akara', 'Pepper Soup',
+    'Americano', 'Cappuccino', 'Latte', 'Espresso', 'Mocha', 'Macchiato',
+]
+STYLES = ['Spicy', 'Smoky', 'Classic', 'Party', 'Mama Put', 'Special', 'Mini', 'Jumbo']
+SIDES = [
+    'chicken', 'beef', 'goat meat', 'fish', 'turkey', 'plantain', 'coleslaw',
+    'egusi soup', 'ewedu', 'gbegiri', 'okro soup', 'vegetables', 'fried egg',
+]
+
+# Typeahead prefixes, whole words and common misspellings
+QUERIES = [
+    'jol', 'jollof', 'jolof rice', 'fried ri', 'amala ewedu', 'egusi', 'poundd yam',
+    'plantian', 'capuccino', 'spicy suya', 'moi', 'pepper soup goat', 'ofada',
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark full-text meal search against LIKE scans on a synthetic catalog (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meals', type=int, default=20000)
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--unavailable', type=float, default=0.3, help='Share of meals marked unavailable, which search must skip'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with rolled_back():
+            self.stdout.write(f"Creating {options['meals']} synthetic meals...")
+            meals = []
+            for i in range(options['meals']):
+                dish = rng.choice(DISHES)
+                sides = ', '.join(rng.sample(SIDES, 2))
+                meals.append(Meal(
+                    name=f'{rng.choice(STYLES)} {dish} #{i}',
+                    description=f'{dish} served with {sides}',
+                    price=rng.randrange(500, 5000, 50),
+                    image='meals/default.jpg',
+                    is_available=rng.random() >= options['unavailable'],
+                ))
+            Meal.objects.bulk_create(meals, batch_size=2000)
+            bump_menu_version()
+
+            queryset = Meal.objects.filter(is_available=True)
+            fts, like = [], []
+            for _ in range(options['rounds']):
+                for query in QUERIES:
+                    elapsed, _ = timed(lambda: list(search_meals(queryset, query)))
+                    fts.append(elapsed)
+                    elapsed, _ = timed(lambda: list(self.like_search(queryset, query)))
+                    like.append(elapsed)
+
+            for query in QUERIES:
+                top = [meal.name for meal in search_meals(queryset, query)[:3]]
+                self.stdout.write(f'  {query!r:<22} -> {top}')
+            self.stdout.write(format_summary('full-text search', fts))
+            self.stdout.write(format_summary('icontains (SearchFilter)', like))
+
+        # Drop the vocabulary cached from the rolled-back rows
+        bump_menu_version()
+
+    def like_search(self, queryset, text):
+        for term in text.split():
+            queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+        return queryset[:100]
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Meal
+from api.tasks import generate_meal_variants
+
+
+class Command(BaseCommand):
+    help = 'Backfill the responsive image variants of meals that have none (or stale ones)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild variants that are already current')
+        parser.add_argument('--queue', action='store_true', help='Hand meals to the Celery workers instead of processing inline')
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        force = options['force']
+        batch_size = options['batch_size']
+
+        pending = []
+        for meal in Meal.objects.exclude(image='').only('id', 'image', 'image_variants').iterator(chunk_size=batch_size):
+            if force or not meal.current_variants():
+                pending.append(meal.pk)
+        self.stdout.write(f'Meals needing variants: {len(pending)}')
+
+        if options['queue']:
+            for meal_id in pending:
+                generate_meal_variants.delay(meal_id, force=force)
+            self.stdout.write(self.style.SUCCESS(f'Queued {len(pending)} meals'))
+            return
+
+        built = 0
+        for index, meal_id in enumerate(pending, 1):
+            built += generate_meal_variants(meal_id, force=force)
+            if index % batch_size == 0:
+                self.stdout.write(f'  {index}/{len(pending)}')
+        self.stdout.write(self.style.SUCCESS(f'Built variants for {built} meals, {len(pending) - built} skipped'))
@@ -0,0 +1,78 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Lower
+
+from api.models import Order
+
+
+def duplicate_groups():
+    """``{lowercased email: [users]}`` for every email on more than one account, keeper first."""
+    emails = (
+        User.objects.exclude(email='')
+        .values(email_lower=Lower('email'))
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .values_list('email_lower', flat=True)
+    )
+    groups = {}
+    # Keep the account signed into most recently; never-used ones go last, oldest first
+    users = User.objects.alias(email_lower=Lower('email')).filter(email_lower__in=list(emails)).order_by(
+        F('last_login').desc(nulls_last=True), 'id'
+    )
+    for user in users:
+        groups.setdefault(user.email.lower(), []).append(user)
+    return groups
+
+
+def renamed_email(user):
+    # Plus-addressing keeps the mailbox recognizable while freeing the address
+    local, _, domain = user.email.rpartition('@')
+    return f'{local}+duplicate-{user.pk}@{domain}'
+
+
+class Command(BaseCommand):
+    help = (
+        'List emails shared by more than one account (which migration 0009 refuses) and free them '
+        'by renaming the extra accounts\' emails, or with --merge by also moving their orders to '
+        'the kept account and deactivating them'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report duplicates without changing them')
+        parser.add_argument(
+            '--merge', action='store_true', help='Move the extra accounts\' orders to the kept one and deactivate them'
+        )
+
+    def handle(self, *args, **options):
+        dry_run, merge = options['dry_run'], options['merge']
+        groups = duplicate_groups()
+        self.stdout.write(f'Emails on more than one account: {len(groups)}')
+
+        action = 'merge into' if merge else 'rename, keeping'
+        for email, (keeper, *others) in groups.items():
+            extras = ', '.join(f'#{user.pk} ({user.username})' for user in others)
+            self.stdout.write(f'  {email}: {action} #{keeper.pk} ({keeper.username}): {extras}')
+        if dry_run:
+            self.stdout.write(self.style.WARNING('Dry run: nothing changed'))
+            return
+
+        changed = 0
+        for keeper, *others in groups.values():
+            with transaction.atomic():
+                for user in others:
+                    user.email = renamed_email(user)
+                    if User.objects.filter(email__iexact=user.email).exists():
+                        raise CommandError(f'Cannot rename account #{user.pk}: {user.email} is taken')
+                    fields = ['email']
+                    if merge:
+                        Order.objects.filter(user=user).update(user=keeper)
+                        user.is_active = False
+                        user.set_unusable_password()
+                        fields += ['is_active', 'password']
+                    # save(), not update(), so the user_changed signal drops cached principals
+                    user.save(update_fields=fields)
+                    changed += 1
+        verb = 'Merged' if merge else 'Renamed the emails of'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {changed} accounts; run migrate again'))
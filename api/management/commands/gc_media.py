@@ -0,0 +1,129 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+
+from api.images import variant_names
+from api.menu import invalidate_menu
+from api.models import Meal, UserProfile
+from api.storage import is_content_addressed
+
+# (model, image field) pairs whose files, and image_variants, are live
+IMAGE_FIELDS = [(Meal, 'image'), (UserProfile, 'profile_image')]
+VARIANTS_DIR = 'variants'
+
+
+def walk(storage, directory):
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield posixpath.join(directory, name)
+    for name in directories:
+        yield from walk(storage, posixpath.join(directory, name))
+
+
+class Command(BaseCommand):
+    help = 'Delete media files that no meal or profile references any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be reclaimed without deleting')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='Leave files modified in the last N seconds, which may belong to uploads not yet committed',
+        )
+        parser.add_argument(
+            '--rehash', action='store_true',
+            help='First move referenced files saved under their upload names to content-addressed ones',
+        )
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        dry_run = options['dry_run']
+        batch_size = options['batch_size']
+
+        if options['rehash']:
+            self.rehash(storage, dry_run, batch_size)
+
+        # List before collecting references: a file referenced after the
+        # query is protected by its fresh mtime, checked again below
+        cutoff = timezone.now() - timedelta(seconds=options['min_age'])
+        directories = [field.upload_to.rstrip('/') for field in self.image_fields()] + [VARIANTS_DIR]
+        candidates = []
+        for directory in directories:
+            if storage.exists(directory):
+                candidates += [
+                    name for name in walk(storage, directory)
+                    if storage.get_modified_time(name) < cutoff
+                ]
+        referenced = self.referenced_names(batch_size)
+        orphans = [name for name in candidates if name not in referenced]
+
+        sizes = {name: storage.size(name) for name in orphans}
+        total = sum(sizes.values())
+        self.stdout.write(f'Scanned {len(candidates)} files, {len(referenced)} referenced')
+        if dry_run:
+            for name in orphans[:20]:
+                self.stdout.write(f'  {name} ({filesizeformat(sizes[name])})')
+            if len(orphans) > 20:
+                self.stdout.write(f'  ... and {len(orphans) - 20} more')
+            self.stdout.write(self.style.WARNING(
+                f'Dry run: {len(orphans)} unreferenced files, {filesizeformat(total)} ({total} bytes) reclaimable'
+            ))
+            return
+
+        deleted = reclaimed = 0
+        for start in range(0, len(orphans), batch_size):
+            for name in orphans[start:start + batch_size]:
+                if storage.get_modified_time(name) >= cutoff:
+                    continue
+                storage.delete(name)
+                deleted += 1
+                reclaimed += sizes[name]
+            self.stdout.write(f'  {min(start + batch_size, len(orphans))}/{len(orphans)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} files, reclaimed {filesizeformat(reclaimed)} ({reclaimed} bytes)'
+        ))
+
+    def image_fields(self):
+        return [model._meta.get_field(field) for model, field in IMAGE_FIELDS]
+
+    def referenced_names(self, batch_size):
+        referenced = set()
+        for model, field in IMAGE_FIELDS:
+            rows = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            for name, variants in rows.values_list(field, 'image_variants').iterator(chunk_size=batch_size):
+                referenced.add(name)
+                referenced |= variant_names(variants)
+        return referenced
+
+    def rehash(self, storage, dry_run, batch_size):
+        moved = 0
+        for model, field in IMAGE_FIELDS:
+            rows = [
+                (pk, name, variants)
+                for pk, name, variants in model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                .values_list('pk', field, 'image_variants').iterator(chunk_size=batch_size)
+                if not is_content_addressed(name) and storage.exists(name)
+            ]
+            if dry_run:
+                moved += len(rows)
+                continue
+            for start in range(0, len(rows), batch_size):
+                with transaction.atomic():
+                    for pk, name, variants in rows[start:start + batch_size]:
+                        with storage.open(name, 'rb') as file:
+                            new_name = storage.save(name, file)
+                        if variants.get('source') == name:
+                            variants['source'] = new_name
+                        # update() so the image signals don't rebuild variants of unchanged bytes
+                        moved += model.objects.filter(pk=pk, **{field: name}).update(
+                            **{field: new_name, 'image_variants': variants}
+                        )
+        if moved and not dry_run:
+            invalidate_menu()
+        verb = 'Would rehash' if dry_run else 'Rehashed'
+        self.stdout.write(f'{verb} {moved} referenced files')
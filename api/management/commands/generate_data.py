@@ -0,0 +1,221 @@
+import random
+import time
+from contextlib import contextmanager
+from itertools import accumulate
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+
+from api.management.commands.bench_search import DISHES, SIDES, STYLES
+from api.menu import invalidate_menu
+from api.models import Cart, CartItem, DeliveryType, GiftDetails, Location, Meal, Order, OrderItem
+from api.models.order import create_default_delivery_types, create_default_locations
+
+# Share of generated orders in each status; open ones are the recent ones
+STATUS_WEIGHTS = {
+    'delivered': 70, 'cancelled': 8, 'paid': 6, 'preparing': 4,
+    'ready': 3, 'delivering': 3, 'pending': 5, 'accepted': 1,
+}
+OPEN_STATUSES = {'accepted', 'pending', 'paid', 'preparing', 'ready', 'delivering'}
+FIRST_NAMES = ['Ada', 'Tunde', 'Ngozi', 'Emeka', 'Bisi', 'Chidi', 'Funke', 'Ife', 'Kemi', 'Segun', 'Zainab', 'Musa']
+INSTRUCTIONS = ['', '', '', 'Extra pepper', 'No onions', 'Less oil', 'Pack soup separately']
+# Fixed so that a seed always yields the same rows, timestamps included
+EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@contextmanager
+def explicit_timestamps(*model_classes):
+    """Let bulk_create keep the created_at/updated_at we set instead of now()."""
+    fields = [
+        field for model in model_classes for field in model._meta.concrete_fields
+        if isinstance(field, models.DateTimeField) and (field.auto_now or field.auto_now_add)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        'Deterministically generate production-scale users, carts, orders, order items and gift '
+        'details with bulk inserts, for load and performance testing. Point it at a scratch database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--meals', type=int, default=200, help='Catalog size; existing meals count towards it')
+        parser.add_argument('--orders-per-user', type=float, default=3, help='Mean orders per user')
+        parser.add_argument('--items-per-order', type=float, default=3, help='Mean lines per order')
+        parser.add_argument('--cart-ratio', type=float, default=0.4, help='Share of users with a non-empty cart')
+        parser.add_argument('--gift-ratio', type=float, default=0.1, help='Share of orders that are gifts')
+        parser.add_argument('--days', type=int, default=180, help='Spread order history over this many days')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Users per transaction')
+        parser.add_argument('--prefix', default='load-', help='Username prefix of generated users')
+        parser.add_argument('--password', default='loadtest-pass', help='Password of every generated user')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--reset', action='store_true', help='Delete previously generated users and their data first')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.options = options
+        prefix = options['prefix']
+        started = time.monotonic()
+
+        existing = User.objects.filter(username__startswith=prefix)
+        if existing.exists():
+            if not options['reset']:
+                raise CommandError(f'Users named {prefix}* already exist; pass --reset to replace them')
+            self.stdout.write('Deleting previously generated data...')
+            with transaction.atomic():
+                GiftDetails.objects.filter(order__user__username__startswith=prefix).delete()
+                existing.delete()
+
+        create_default_delivery_types()
+        create_default_locations()
+        self.delivery_types = list(DeliveryType.objects.all())
+        self.locations = list(Location.objects.all())
+        self.meals = self.ensure_meals(options['meals'])
+        # Popular dishes dominate, as on a real menu
+        self.meal_weights = list(accumulate(1 / (rank + 1) for rank in range(len(self.meals))))
+        # Hashed once: hashing per user would dominate the run
+        self.password = make_password(options['password'])
+
+        self.counts = dict.fromkeys(['users', 'carts', 'cart items', 'orders', 'order items', 'gift details'], 0)
+        total, chunk_size = options['users'], options['chunk_size']
+        for start in range(0, total, chunk_size):
+            with transaction.atomic(), explicit_timestamps(User, Cart, Order):
+                self.generate_chunk(start, min(start + chunk_size, total))
+            elapsed = time.monotonic() - started
+            rows = sum(self.counts.values())
+            self.stdout.write(
+                f'  {self.counts["users"]}/{total} users, {rows} rows, '
+                f'{elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)'
+            )
+
+        elapsed = time.monotonic() - started
+        summary = ', '.join(f'{count} {label}' for label, count in self.counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Generated {summary} in {elapsed:.1f}s'))
+
+    def ensure_meals(self, count):
+        # Its own stream, so rows come out the same whether or not meals had to be made
+        rng = random.Random(self.options['seed'])
+        meals = list(Meal.objects.filter(is_available=True).order_by('id')[:count])
+        image = meals[0].image.name if meals else ''
+        new = []
+        for i in range(len(meals), count):
+            dish = rng.choice(DISHES)
+            new.append(Meal(
+                name=f'{rng.choice(STYLES)} {dish} #{i}',
+                description=f'{dish} served with {", ".join(rng.sample(SIDES, 2))}',
+                price=rng.randrange(500, 5000, 50),
+                image=image,
+            ))
+        if new:
+            Meal.objects.bulk_create(new)
+            # bulk_create skips the signals that drop the cached menu
+            invalidate_menu()
+            self.stdout.write(f'Created {len(new)} meals')
+        meals += new
+        self.rng.shuffle(meals)
+        return meals
+
+    def count(self, n):
+        # Poisson-ish around the mean, but never zero
+        return max(1, round(self.rng.expovariate(1 / n))) if n > 0 else 0
+
+    def lines(self, mean):
+        # One line per meal, as in a cart
+        meals = dict.fromkeys(self.rng.choices(self.meals, cum_weights=self.meal_weights, k=self.count(mean)))
+        for meal in meals:
+            quantity = self.rng.choice([1, 1, 1, 2, 2, 3])
+            portions = self.rng.choice([1, 1, 1, 2])
+            plates = self.rng.choice([1, 1, 1, 1, 2])
+            yield meal, quantity, portions, plates, meal.price * quantity * portions * plates
+
+    def generate_chunk(self, first, last):
+        rng, options, prefix = self.rng, self.options, self.options['prefix']
+        history = timedelta(days=options['days'])
+
+        users = []
+        for i in range(first, last):
+            joined = EPOCH - history + timedelta(seconds=rng.uniform(0, history.total_seconds()))
+            users.append(User(
+                username=f'{prefix}{i:07d}',
+                email=f'{prefix}{i:07d}@example.com',
+                first_name=rng.choice(FIRST_NAMES),
+                password=self.password,
+                date_joined=joined,
+            ))
+        User.objects.bulk_create(users)
+        self.counts['users'] += len(users)
+
+        carts, cart_items = [], []
+        for user in users:
+            has_items = rng.random() < options['cart_ratio']
+            cart = Cart(user=user, created_at=user.date_joined, updated_at=EPOCH)
+            carts.append(cart)
+            if not has_items:
+                continue
+            for meal, quantity, portions, plates, total in self.lines(2):
+                cart_items.append(CartItem(
+                    cart=cart, meal=meal, quantity=quantity, portions=portions, plates=plates, total_price=total,
+                ))
+                cart.subtotal += total
+                cart.item_count += 1
+        Cart.objects.bulk_create(carts)
+        # bulk_create skips CartItem.save(), so totals were filled in above
+        CartItem.objects.bulk_create(cart_items)
+        self.counts['carts'] += len(carts)
+        self.counts['cart items'] += len(cart_items)
+
+        orders, order_lines, gifts = [], [], []
+        statuses, weights = list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values())
+        for user in users:
+            for _ in range(self.count(options['orders_per_user'])):
+                since_join = (EPOCH - user.date_joined).total_seconds()
+                created = user.date_joined + timedelta(seconds=rng.uniform(0, since_join))
+                status = rng.choices(statuses, weights)[0]
+                # Open orders belong to the last couple of days
+                if status in OPEN_STATUSES:
+                    created = EPOCH - timedelta(seconds=rng.uniform(0, 2 * 86400))
+                delivery_type = rng.choice(self.delivery_types)
+                order = Order(
+                    user=user,
+                    delivery_type=delivery_type,
+                    location=rng.choice(self.locations),
+                    status=status,
+                    total_amount=delivery_type.price,
+                    created_at=created,
+                    updated_at=created + timedelta(minutes=rng.uniform(0, 90)),
+                )
+                if rng.random() < options['gift_ratio']:
+                    order.is_gift = True
+                    gifts.append((order, GiftDetails(
+                        whatsapp_number=f'0{rng.randrange(10 ** 10):010d}',
+                        recipient_name=rng.choice(FIRST_NAMES),
+                        recipient_matric_number=str(rng.randrange(10 ** 8, 10 ** 9)),
+                    )))
+                for meal, quantity, portions, plates, total in self.lines(options['items_per_order']):
+                    order_lines.append(OrderItem(
+                        order=order, meal=meal, quantity=quantity, portions=portions, plates=plates,
+                        special_instructions=rng.choice(INSTRUCTIONS), unit_price=meal.price, total_price=total,
+                    ))
+                    order.total_amount += total
+                orders.append(order)
+
+        GiftDetails.objects.bulk_create([gift for _, gift in gifts])
+        for order, gift in gifts:
+            order.gift_details = gift
+        Order.objects.bulk_create(orders)
+        OrderItem.objects.bulk_create(order_lines)
+        self.counts['orders'] += len(orders)
+        self.counts['order items'] += len(order_lines)
+        self.counts['gift details'] += len(gifts)
@@ -0,0 +1,73 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarking import unthrottled
+from api.loadtest import compare, load_baseline, run, save_baseline
+from api.loadtest.transports import HTTPTransport, InProcessTransport
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive concurrent register -> login -> browse -> cart -> checkout -> poll journeys and report '
+        'latency and throughput per endpoint. In-process runs write real rows (removed afterwards), '
+        'so point them at a scratch database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Concurrent virtual users')
+        parser.add_argument('--iterations', type=int, default=5, help='Checkouts per virtual user')
+        parser.add_argument(
+            '--base-url',
+            help='Load a running server (start it with raised THROTTLE_* rates) instead of this process',
+        )
+        parser.add_argument('--cart-lines', type=int, default=4, help='Most meals added per checkout')
+        parser.add_argument('--think-time', type=float, default=0, help='Seconds to pause between cart additions')
+        parser.add_argument('--poll-interval', type=float, default=0.2)
+        parser.add_argument('--max-polls', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--save-baseline', metavar='PATH', help='Store this run as the baseline')
+        parser.add_argument('--baseline', metavar='PATH', help='Fail if this run regresses against the baseline')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown as a fraction')
+
+    def handle(self, *args, **options):
+        options['password'] = 'loadtest-pass-1'
+        prefix = f'lt-{int(time.time())}-'
+        mode = 'http' if options['base_url'] else 'in-process'
+        meta = {'users': options['users'], 'iterations': options['iterations'], 'mode': mode}
+
+        baseline = None
+        if options['baseline']:
+            baseline = load_baseline(options['baseline'])
+            if baseline['meta'] != meta:
+                raise CommandError(f"Baseline was recorded with {baseline['meta']}, this run is {meta}")
+
+        self.stdout.write(f"{options['users']} users x {options['iterations']} checkouts ({mode})...")
+        if options['base_url']:
+            recorder = run(
+                lambda: HTTPTransport(options['base_url']), options['users'], options['iterations'],
+                options, prefix, options['seed'],
+            )
+        else:
+            try:
+                with unthrottled():
+                    recorder = run(
+                        InProcessTransport, options['users'], options['iterations'], options, prefix, options['seed'],
+                    )
+            finally:
+                # Orders and carts go with their users
+                User.objects.filter(username__startswith=prefix).delete()
+
+        self.stdout.write(recorder.report())
+        endpoints = recorder.endpoints()
+        if options['save_baseline']:
+            if recorder.journeys['failed']:
+                raise CommandError('Not saving a baseline from a run with failed journeys')
+            save_baseline(options['save_baseline'], endpoints, meta)
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {options['save_baseline']}"))
+        if baseline is not None:
+            regressions = compare(baseline, endpoints, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressed against the baseline:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
@@ -0,0 +1,68 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from api.models import Cart, CartItem
+
+
+class Command(BaseCommand):
+    help = 'Verify the denormalized cart subtotals and item counts, repairing any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without repairing it')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        batch_size = options['batch_size']
+
+        # Lines whose stored total no longer matches the meal price
+        expected_line = ExpressionWrapper(
+            F('meal__price') * F('quantity') * F('portions') * F('plates'),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
+        stale_lines = list(
+            CartItem.objects.annotate(expected=expected_line)
+            .exclude(total_price=F('expected'))
+            .values_list('id', 'cart_id')
+        )
+        stale_line_carts = {cart_id for _, cart_id in stale_lines}
+        if stale_lines and not dry_run:
+            ids = [line_id for line_id, _ in stale_lines]
+            for start in range(0, len(ids), batch_size):
+                CartItem.objects.filter(id__in=ids[start:start + batch_size]).reprice()
+        self.stdout.write(f'Cart lines with stale totals: {len(stale_lines)}')
+
+        # Carts whose counters disagree with their lines
+        drifted = list(
+            Cart.objects.annotate(
+                actual_subtotal=Coalesce(
+                    Sum('items__total_price'), Value(Decimal('0.00')),
+                    output_field=DecimalField(max_digits=12, decimal_places=2),
+                ),
+                actual_count=Count('items'),
+            )
+            .filter(~Q(subtotal=F('actual_subtotal')) | ~Q(item_count=F('actual_count')))
+            .values_list('id', 'subtotal', 'actual_subtotal', 'item_count', 'actual_count')
+        )
+        for cart_id, subtotal, actual_subtotal, item_count, actual_count in drifted[:20]:
+            self.stdout.write(
+                f'  cart {cart_id}: subtotal {subtotal} -> {actual_subtotal}, items {item_count} -> {actual_count}'
+            )
+        if len(drifted) > 20:
+            self.stdout.write(f'  ... and {len(drifted) - 20} more')
+
+        to_repair = sorted(stale_line_carts | {row[0] for row in drifted})
+        if dry_run:
+            self.stdout.write(self.style.WARNING(
+                f'Dry run: {len(to_repair)} carts need repair, nothing changed'
+            ))
+            return
+
+        for start in range(0, len(to_repair), batch_size):
+            with transaction.atomic():
+                Cart.objects.filter(id__in=to_repair[start:start + batch_size]).recalculate_totals()
+        self.stdout.write(self.style.SUCCESS(f'Repaired {len(to_repair)} carts'))
@@ -0,0 +1,38 @@
+import sqlite3
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the SQLite primary onto each SQLite replica in DATABASE_REPLICA_URLS, once or every '
+        '--interval seconds, to try replica routing locally with realistic lag.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0, help='Keep copying, this many seconds apart')
+
+    def handle(self, *args, **options):
+        primary = connections['default'].settings_dict
+        replicas = [
+            connections[alias].settings_dict for alias in settings.REPLICA_DATABASES
+            if connections[alias].vendor == 'sqlite'
+        ]
+        if primary['ENGINE'] != 'django.db.backends.sqlite3' or not replicas:
+            raise CommandError('Needs a SQLite primary and at least one SQLite replica in DATABASE_REPLICA_URLS')
+
+        while True:
+            started = time.perf_counter()
+            with closing(sqlite3.connect(primary['NAME'])) as source:
+                for replica in replicas:
+                    # The online backup API copies a consistent snapshot while writers carry on
+                    with closing(sqlite3.connect(replica['NAME'])) as target:
+                        source.backup(target)
+            self.stdout.write(f'Synced {len(replicas)} replica(s) in {time.perf_counter() - started:.2f}s')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,130 @@
+"""
+Media delivery that keeps image bytes off the app workers where possible.
+
+MEDIA_SERVE_MODE picks how a file leaves the process:
+
+- ``'accel'``: an empty response with ``X-Accel-Redirect`` to
+  MEDIA_ACCEL_PREFIX, for an nginx ``internal`` location to send the file;
+- ``'sendfile'``: ``X-Sendfile`` with the absolute path, for Apache/lighttpd;
+- ``'django'``: streamed from here, honouring single ``Range`` requests.
+
+Content-addressed names (api/storage.py) never change content, so they are
+cacheable forever; anything else gets MEDIA_CACHE_MAX_AGE.
+"""
+import mimetypes
+import os
+import re
+from stat import S_ISREG
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .storage import is_content_addressed
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def cache_control(path):
+    if is_content_addressed(path):
+        return IMMUTABLE
+    return f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+
+
+def parse_range(header, size):
+    """``(start, end)`` inclusive for a single satisfiable range, None to send it all, or False."""
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        # Malformed or multi-range: a full 200 is always a valid answer
+        return None
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(0, size - int(last)), size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def read_range(file, start, length):
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        full_path = default_storage.path(path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    # Directories, and gc-able temp files from interrupted saves, aren't media
+    if not S_ISREG(stat.st_mode) or os.path.basename(path).startswith('.'):
+        raise Http404
+
+    etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+    headers = {
+        'Cache-Control': cache_control(path),
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+    }
+    if_none_match = request.headers.get('If-None-Match')
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    if (if_none_match and etag in if_none_match) or (
+        not if_none_match and if_modified_since and int(stat.st_mtime) <= if_modified_since
+    ):
+        return HttpResponseNotModified(headers=headers)
+
+    mode = settings.MEDIA_SERVE_MODE
+    if mode == 'accel':
+        response = HttpResponse(headers=headers)
+        # nginx supplies the body, length and ranges; an empty type lets it pick one
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + quote(path)
+        del response['Content-Type']
+        return response
+    if mode == 'sendfile':
+        response = HttpResponse(headers=headers)
+        response['X-Sendfile'] = full_path
+        del response['Content-Type']
+        return response
+
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    headers['Accept-Ranges'] = 'bytes'
+    if request.method == 'HEAD':
+        return HttpResponse(content_type=content_type, headers={**headers, 'Content-Length': str(stat.st_size)})
+    byte_range = None
+    # A range of a file that changed since the client's copy would splice two versions
+    if 'Range' in request.headers and request.headers.get('If-Range', etag) == etag:
+        byte_range = parse_range(request.headers['Range'], stat.st_size)
+    if byte_range is False:
+        return HttpResponse(status=416, headers={**headers, 'Content-Range': f'bytes */{stat.st_size}'})
+    if byte_range is None:
+        # FileResponse hands the file to wsgi.file_wrapper (sendfile under gunicorn)
+        return FileResponse(open(full_path, 'rb'), content_type=content_type, headers=headers)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        read_range(open(full_path, 'rb'), start, length), status=206, content_type=content_type, headers=headers,
+    )
+    response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response['Content-Length'] = str(length)
+    return response
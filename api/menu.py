@@ -0,0 +1,141 @@
+import hashlib
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from . import metrics
+from .cache import is_process_local
+from .replicas import use_primary
+
+MENU_VERSION_KEY = 'menu:version'
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+# Without a shared cache a save only bumps the version in the process that
+# made it (and never from a Celery worker), so other processes may serve a
+# stale menu until their snapshot expires
+LOCAL_SNAPSHOT_TIMEOUT = 5
+# Cursors and page sizes come from the client; past this many variants of
+# one version, pages are built per request instead of cached
+MAX_SNAPSHOTS_PER_VERSION = 200
+REBUILD_LOCK_TIMEOUT = 30
+REBUILD_WAIT = 5
+
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+
+def get_menu_version():
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a flushed cache never reuses an old version
+        cache.add(MENU_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(MENU_VERSION_KEY)
+    return version
+
+
+def bump_menu_version():
+    try:
+        cache.incr(MENU_VERSION_KEY)
+    except ValueError:
+        get_menu_version()
+        cache.incr(MENU_VERSION_KEY)
+
+
+def invalidate_menu():
+    # Bump only once the change is visible to other connections, otherwise a
+    # concurrent rebuild could cache the old rows under the new version.
+    transaction.on_commit(bump_menu_version)
+
+
+def make_etag(content):
+    return '"%s"' % hashlib.sha256(content).hexdigest()[:32]
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates
+
+
+def snapshot_timeout():
+    return LOCAL_SNAPSHOT_TIMEOUT if is_process_local() else SNAPSHOT_TIMEOUT
+
+
+def _snapshot_key(request, variant):
+    # Image URLs are absolute, so snapshots are per host/scheme
+    base = request.build_absolute_uri('/')
+    digest = hashlib.md5(f'{base}|{variant}'.encode()).hexdigest()
+    return f'menu:snapshot:{get_menu_version()}:{digest}'
+
+
+def _claim_snapshot_slot(key):
+    """False once the key's version already holds MAX_SNAPSHOTS_PER_VERSION snapshots."""
+    count_key = key.rsplit(':', 1)[0] + ':count'
+    cache.add(count_key, 0, timeout=snapshot_timeout())
+    try:
+        return cache.incr(count_key) <= MAX_SNAPSHOTS_PER_VERSION
+    except ValueError:
+        # Expired between add and incr
+        return True
+
+
+def _local_lock(key):
+    with _local_locks_guard:
+        if len(_local_locks) > 256:
+            _local_locks.clear()
+        return _local_locks.setdefault(key, threading.Lock())
+
+
+def get_snapshot(request, build, variant=''):
+    """
+    Return ``(etag, content)`` for the current menu version, building it at
+    most once per version. ``build`` must return the data to render.
+    """
+    key = _snapshot_key(request, variant)
+    snapshot = cache.get(key)
+    metrics.cache_lookup('menu', snapshot is not None)
+    if snapshot is not None:
+        return snapshot
+
+    # Single-flight: one rebuild per process, and one per cluster via the
+    # cache lock; everyone else waits for the winner's result.
+    with _local_lock(key):
+        snapshot = cache.get(key)
+        if snapshot is not None:
+            return snapshot
+
+        lock_key = f'{key}:lock'
+        deadline = time.monotonic() + REBUILD_WAIT
+        while not cache.add(lock_key, 1, timeout=REBUILD_LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                # Builder looks stuck, build it ourselves rather than fail
+                break
+            time.sleep(0.05)
+            snapshot = cache.get(key)
+            if snapshot is not None:
+                return snapshot
+
+        try:
+            with use_primary():
+                content = JSONRenderer().render(build())
+            snapshot = (make_etag(content), content)
+            if _claim_snapshot_slot(key):
+                cache.set(key, snapshot, timeout=snapshot_timeout())
+        finally:
+            cache.delete(lock_key)
+        return snapshot
+
+
+def snapshot_response(request, build, variant=''):
+    etag, content = get_snapshot(request, build, variant)
+    if etag_matches(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
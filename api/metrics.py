@@ -0,0 +1,272 @@
+"""
+Prometheus metrics, aggregated across every web and worker process.
+
+Each process counts into a local buffer, and a background thread adds the
+buffered deltas to counters in the default cache every
+METRICS_FLUSH_INTERVAL seconds, the same shared-cache totals that
+task_metrics keeps. Whichever worker answers ``/metrics`` therefore reports
+the whole deployment, as long as that cache is shared (Redis, with
+REDIS_URL): with the local-memory fallback each process only sees its own
+counts, which is logged as a warning when there is more than one process.
+Histograms are stored as per-bucket counters and made cumulative when
+rendered.
+"""
+import atexit
+import hashlib
+import hmac
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.views.decorators.http import require_safe
+
+from . import task_metrics
+from .cache import is_process_local
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'metrics'
+SERIES_KEY = f'{PREFIX}:series'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+# name: (type, help, histogram buckets, histogram sum scale)
+DEFINITIONS = {
+    'http_request_duration_seconds': (
+        'histogram', 'Request latency by route, method and status class', LATENCY_BUCKETS, 1_000_000,
+    ),
+    'http_request_db_queries': ('histogram', 'SQL statements per request by route', QUERY_BUCKETS, 1),
+    'cache_requests_total': ('counter', 'Cache lookups by cache and result (hit or miss)', None, None),
+    'cart_mutations_total': ('counter', 'Successful cart changes by action', None, None),
+    'orders_created_total': ('counter', 'Orders accepted at checkout by delivery type and location', None, None),
+    'payment_confirmations_total': ('counter', 'Orders marked paid by source', None, None),
+}
+
+_pending = Counter()
+_series = set()
+_lock = threading.Lock()
+_flusher_pid = None
+
+
+def _labels(labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in sorted(labels.items()))
+
+
+def _key(series, field):
+    # Label values may hold spaces and quotes, which not every cache accepts in keys
+    return f'{PREFIX}:{hashlib.md5(series.encode()).hexdigest()}:{field}'
+
+
+def _record(name, labels, fields):
+    _ensure_flusher()
+    series = f'{name}|{_labels(labels)}'
+    with _lock:
+        _series.add(series)
+        for field, amount in fields:
+            _pending[_key(series, field)] += amount
+
+
+def inc(name, amount=1, **labels):
+    _record(name, labels, [('value', amount)])
+
+
+def observe(name, value, **labels):
+    _, _, buckets, scale = DEFINITIONS[name]
+    _record(name, labels, [
+        (f'bucket{bisect_left(buckets, value)}', 1),
+        ('sum', round(value * scale)),
+        ('count', 1),
+    ])
+
+
+def cache_lookup(name, hit):
+    inc('cache_requests_total', cache=name, result='hit' if hit else 'miss')
+
+
+def flush():
+    """Add this process's buffered counts to the shared totals."""
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        series = set(_series)
+    try:
+        for key, amount in pending.items():
+            cache.add(key, 0, None)
+            cache.incr(key, amount)
+        # Read-modify-write, so a concurrent flush can drop a name; every flush re-adds its own
+        known = cache.get(SERIES_KEY) or []
+        if not series.issubset(known):
+            cache.set(SERIES_KEY, sorted(series.union(known)), None)
+    except Exception:
+        logger.exception('Could not flush metrics, retrying next interval')
+        with _lock:
+            _pending.update(pending)
+
+
+def _flush_forever():
+    while True:
+        time.sleep(settings.METRICS_FLUSH_INTERVAL)
+        flush()
+
+
+def check_shared_cache(forked=False):
+    """Warn when the totals can't be shared: a process-local cache with several processes."""
+    backend = settings.CACHES['default']['BACKEND']
+    # Gunicorn reads its worker count from WEB_CONCURRENCY
+    processes = int(os.environ.get('WEB_CONCURRENCY', 1))
+    if is_process_local() and (forked or processes > 1):
+        logger.warning(
+            'Metrics totals live in the process-local %s, so /metrics only reports the process '
+            'that answers it; set REDIS_URL to share them', backend.rsplit('.', 1)[-1],
+        )
+        return False
+    return True
+
+
+def _ensure_flusher():
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        forked = _flusher_pid is not None
+        if forked:
+            # A forked worker inherits its parent's buffer, which the parent flushes
+            _pending.clear()
+        else:
+            atexit.register(flush)
+        _flusher_pid = os.getpid()
+        threading.Thread(target=_flush_forever, name='metrics-flush', daemon=True).start()
+    check_shared_cache(forked)
+
+
+def _sample(name, labels, value, extra=''):
+    labels = ','.join(filter(None, [labels, extra]))
+    return f'{name}{{{labels}}} {value}' if labels else f'{name} {value}'
+
+
+def render():
+    """Shared totals in the Prometheus text exposition format."""
+    flush()
+    series = cache.get(SERIES_KEY) or []
+    fields = {}
+    for entry in series:
+        name = entry.split('|', 1)[0]
+        buckets = DEFINITIONS[name][2] if name in DEFINITIONS else None
+        if buckets is None:
+            fields[entry] = ['value']
+        else:
+            fields[entry] = [f'bucket{index}' for index in range(len(buckets) + 1)] + ['sum', 'count']
+    values = cache.get_many([_key(entry, field) for entry in series for field in fields[entry]])
+
+    by_name = {}
+    for entry in series:
+        name, labels = entry.split('|', 1)
+        by_name.setdefault(name, []).append((labels, {
+            field: values.get(_key(entry, field), 0) for field in fields[entry]
+        }))
+
+    lines = []
+    for name, (kind, help_text, buckets, scale) in DEFINITIONS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        for labels, counts in by_name.get(name, []):
+            if kind == 'counter':
+                lines.append(_sample(name, labels, counts['value']))
+                continue
+            total = 0
+            for index, bound in enumerate((*buckets, '+Inf')):
+                total += counts[f'bucket{index}']
+                lines.append(_sample(f'{name}_bucket', labels, total, f'le="{bound}"'))
+            lines.append(_sample(f'{name}_sum', labels, counts['sum'] / scale))
+            lines.append(_sample(f'{name}_count', labels, counts['count']))
+    lines += _task_lines()
+    return '\n'.join(lines) + '\n'
+
+
+def _task_lines():
+    stats = task_metrics.task_stats()
+    lines = []
+    for name, field, kind, scale, help_text in (
+        ('celery_task_runs_total', 'count', 'counter', 1, 'Task runs'),
+        ('celery_task_failures_total', 'failures', 'counter', 1, 'Task runs that failed'),
+        ('celery_task_wait_seconds_total', 'wait_ms_total', 'counter', 1000, 'Time spent queued'),
+        ('celery_task_wait_seconds_max', 'wait_ms_max', 'gauge', 1000, 'Longest time spent queued'),
+        ('celery_task_run_seconds_total', 'run_ms_total', 'counter', 1000, 'Time spent running'),
+        ('celery_task_run_seconds_max', 'run_ms_max', 'gauge', 1000, 'Longest run'),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        for task_name, values in sorted(stats.items()):
+            value = values[field] if scale == 1 else values[field] / scale
+            lines.append(_sample(name, _labels({'task': task_name}), value))
+    depth = task_metrics.queue_depth()
+    if depth is not None:
+        lines += [
+            '# HELP celery_queue_depth Messages waiting in the default queue',
+            '# TYPE celery_queue_depth gauge',
+            f'celery_queue_depth {depth}',
+        ]
+    return lines
+
+
+class MetricsMiddleware:
+    """Request latency and query count per route. Async requests (event streams) aren't timed."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        # Route names, not paths, so ids don't explode the label space
+        route = (match.url_name or match.view_name) if match else 'unmatched'
+        observe(
+            'http_request_duration_seconds', elapsed,
+            route=route, method=request.method, status=f'{response.status_code // 100}xx',
+        )
+        observe('http_request_db_queries', queries[0], route=route)
+        return response
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+
+@require_safe
+def metrics_view(request):
+    """Scraped with ``Authorization: Bearer <METRICS_TOKEN>``; open without a token only under DEBUG."""
+    token = settings.METRICS_TOKEN
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    # Bytes, since compare_digest rejects non-ASCII str with a TypeError
+    if not (hmac.compare_digest(supplied.encode(), token.encode()) if token else settings.DEBUG):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
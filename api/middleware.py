@@ -0,0 +1,89 @@
+import asyncio
+import math
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+
+
+class AdmissionControlMiddleware:
+    """
+    Sheds load with 503 + Retry-After instead of letting requests queue.
+
+    A request is turned away when the proxy's ``X-Request-Start`` header
+    shows it already waited longer than ADMISSION_MAX_QUEUE_MS, or when it
+    can't get one of this process's ADMISSION_MAX_CONCURRENCY slots within
+    what is left of that budget. Long-lived streams in
+    ADMISSION_EXEMPT_PATHS are not counted under ASGI, where they don't hold
+    a worker; under WSGI every request counts.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.max_concurrency = settings.ADMISSION_MAX_CONCURRENCY
+        self.max_queue = settings.ADMISSION_MAX_QUEUE_MS / 1000
+        self.exempt_paths = tuple(settings.ADMISSION_EXEMPT_PATHS)
+        self.slots = threading.BoundedSemaphore(self.max_concurrency) if self.max_concurrency else None
+        self._async_slots = None
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def queued_for(self, request):
+        """Seconds since the proxy received the request, if it says."""
+        start = request.META.get('HTTP_X_REQUEST_START', '')
+        # nginx sends 't=<seconds.millis>', Heroku-style routers plain milliseconds
+        start = start[2:] if start.startswith('t=') else start
+        try:
+            start = float(start)
+        except ValueError:
+            return 0
+        if start > 1e11:
+            start /= 1000
+        return max(0, time.time() - start)
+
+    def reject(self):
+        response = JsonResponse(
+            {'error': 'The server is busy, please try again shortly.'},
+            status=503
+        )
+        # Roughly how long the backlog we just refused to join takes to drain
+        response['Retry-After'] = str(max(1, math.ceil(self.max_queue)))
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        waited = self.queued_for(request)
+        if waited > self.max_queue:
+            return self.reject()
+        if self.slots is None:
+            return self.get_response(request)
+        if not self.slots.acquire(timeout=self.max_queue - waited):
+            return self.reject()
+        try:
+            return self.get_response(request)
+        finally:
+            self.slots.release()
+
+    async def __acall__(self, request):
+        if request.path.startswith(self.exempt_paths):
+            return await self.get_response(request)
+        waited = self.queued_for(request)
+        if waited > self.max_queue:
+            return self.reject()
+        if self.max_concurrency == 0:
+            return await self.get_response(request)
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+        try:
+            await asyncio.wait_for(self._async_slots.acquire(), self.max_queue - waited)
+        except asyncio.TimeoutError:
+            return self.reject()
+        try:
+            return await self.get_response(request)
+        finally:
+            self._async_slots.release()
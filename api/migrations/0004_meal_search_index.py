@@ -0,0 +1,75 @@
+from django.db import migrations
+
+SQLITE_FORWARDS = [
+    """
+    CREATE VIRTUAL TABLE api_meal_fts USING fts5(
+        name, description,
+        content='api_meal', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    "CREATE VIRTUAL TABLE api_meal_fts_vocab USING fts5vocab(api_meal_fts, 'row')",
+    """
+    CREATE TRIGGER api_meal_fts_ai AFTER INSERT ON api_meal BEGIN
+        INSERT INTO api_meal_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER api_meal_fts_ad AFTER DELETE ON api_meal BEGIN
+        INSERT INTO api_meal_fts(api_meal_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER api_meal_fts_au AFTER UPDATE OF name, description ON api_meal BEGIN
+        INSERT INTO api_meal_fts(api_meal_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO api_meal_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO api_meal_fts(api_meal_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARDS = [
+    'DROP TRIGGER IF EXISTS api_meal_fts_au',
+    'DROP TRIGGER IF EXISTS api_meal_fts_ad',
+    'DROP TRIGGER IF EXISTS api_meal_fts_ai',
+    'DROP TABLE IF EXISTS api_meal_fts_vocab',
+    'DROP TABLE IF EXISTS api_meal_fts',
+]
+
+POSTGRES_FORWARDS = [
+    """
+    CREATE INDEX api_meal_search_idx ON api_meal USING gin (
+        to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))
+    )
+    """,
+]
+
+POSTGRES_BACKWARDS = [
+    'DROP INDEX IF EXISTS api_meal_search_idx',
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for statement in statements.get(vendor, []):
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_userprofile'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARDS, 'postgresql': POSTGRES_FORWARDS}),
+            run({'sqlite': SQLITE_BACKWARDS, 'postgresql': POSTGRES_BACKWARDS}),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:35
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def backfill_totals(apps, schema_editor):
+    Cart = apps.get_model('api', 'Cart')
+    CartItem = apps.get_model('api', 'CartItem')
+    for cart in Cart.objects.all():
+        subtotal = Decimal('0.00')
+        items = CartItem.objects.filter(cart=cart).select_related('meal')
+        for item in items:
+            item.total_price = item.meal.price * item.quantity * item.portions * item.plates
+            item.save(update_fields=['total_price'])
+            subtotal += item.total_price
+        cart.subtotal = subtotal
+        cart.item_count = len(items)
+        cart.save(update_fields=['subtotal', 'item_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_created_at_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='cartitem',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+# Case-insensitive and partial: accounts created without an email (e.g.
+# createsuperuser) don't collide. Queries must repeat ``email > ''`` for the
+# planner to use it. The same SQL works on SQLite and Postgres.
+CREATE_INDEX = "CREATE UNIQUE INDEX auth_user_email_lower_uniq ON auth_user (LOWER(email)) WHERE email > ''"
+DROP_INDEX = 'DROP INDEX IF EXISTS auth_user_email_lower_uniq'
+
+
+def create_index(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    duplicates = list(
+        User.objects.exclude(email='')
+        .values(email_lower=Lower('email'))
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .values_list('email_lower', flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            'Cannot add a unique email index; these emails belong to more than one account: '
+            + ', '.join(duplicates)
+            + '. Review them with "python manage.py dedupe_emails --dry-run", fix them with '
+            '"python manage.py dedupe_emails" (or --merge), then migrate again.'
+        )
+    schema_editor.execute(CREATE_INDEX)
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute(DROP_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_payment_events'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
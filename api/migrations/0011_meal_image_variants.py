@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:59
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+search_index = import_module('api.migrations.0004_meal_search_index')
+
+# SQLite adds this column by remaking api_meal, which drops the search
+# triggers from 0004; put them back and reindex
+SQLITE_TRIGGERS = [
+    statement for statement in search_index.SQLITE_FORWARDS if 'CREATE TRIGGER' in statement
+] + ["INSERT INTO api_meal_fts(api_meal_fts) VALUES ('rebuild')"]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_userprofile_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meal',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(
+            search_index.run({'sqlite': SQLITE_TRIGGERS}),
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_order_accepted_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_accepted_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', 'accepted'), models.Q(('payment_intent_id', ''), ('status', 'pending')), _connector='OR'), fields=['created_at'], name='order_unprocessed_idx'),
+        ),
+    ]
@@ -1,9 +1,12 @@
 from .meal import Meal
 from .order import Order, OrderItem, DeliveryType, Location, GiftDetails
 from .cart import Cart, CartItem
+from .payment import PaymentEvent
 from django.db import models
 from django.contrib.auth.models import User
 
+from ..images import current_variants
+
 __all__ = [
     'Meal',
     'Order',
@@ -13,11 +16,24 @@ __all__ = [
     'GiftDetails',
     'Cart',
     'CartItem',
+    'PaymentEvent',
 ]
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     profile_image = models.ImageField(upload_to='profile_images/', blank=True, null=True)
+    # {'source': <profile_image name>, 'sizes': {...}}, filled in by a worker; see api/images.py
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the post_save hook tell a new upload from any other edit
+        instance._saved_image = instance.__dict__.get('profile_image')
+        return instance
+
+    def current_variants(self):
+        return current_variants(self.profile_image, self.image_variants)
 
     def __str__(self):
         return f"Profile of {self.user.username}"
@@ -1,21 +1,101 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+
+from .meal import Meal
 
 User = get_user_model()
 
+ZERO = Decimal('0.00')
+
+
+class CartQuerySet(models.QuerySet):
+    def recalculate_totals(self):
+        """Recompute subtotal and item_count from the item rows, set-based."""
+        items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+        return self.update(
+            subtotal=Coalesce(
+                Subquery(items.annotate(total=Sum('total_price')).values('total')),
+                Value(ZERO),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+            item_count=Coalesce(Subquery(items.annotate(count=Count('id')).values('count')), Value(0)),
+            updated_at=timezone.now(),
+        )
+
+
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
+    # Maintained incrementally by CartItem.save()/delete(); see reconcile_carts
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=ZERO)
+    item_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
     @property
     def total_amount(self):
-        return sum(item.total_price for item in self.items.all())
+        return self.subtotal
+
+    @staticmethod
+    def adjust_totals(cart_id, amount, count=0):
+        Cart.objects.filter(pk=cart_id).update(
+            subtotal=F('subtotal') + amount,
+            item_count=F('item_count') + count,
+            updated_at=timezone.now(),
+        )
+
+    def upsert_items(self, lines, prices):
+        """
+        Insert or overwrite one line per meal in a single statement against
+        the (cart, meal) unique constraint. ``prices`` maps meal id -> price.
+        """
+        # ON CONFLICT can't touch the same row twice; the last line per meal wins
+        by_meal = {line['meal_id']: line for line in lines}
+        items = []
+        for meal_id, line in by_meal.items():
+            item = CartItem(
+                cart=self,
+                meal_id=meal_id,
+                quantity=line.get('quantity', 1),
+                portions=line.get('portions', 1),
+                plates=line.get('plates', 1),
+                special_instructions=line.get('special_instructions', ''),
+            )
+            item.total_price = prices[meal_id] * item.quantity * item.portions * item.plates
+            items.append(item)
+        with transaction.atomic(savepoint=False):
+            CartItem.objects.bulk_create(
+                items,
+                update_conflicts=True,
+                unique_fields=['cart', 'meal'],
+                update_fields=['quantity', 'portions', 'plates', 'special_instructions', 'total_price'],
+            )
+            # bulk_create skips CartItem.save(), so recount from the rows
+            Cart.objects.filter(pk=self.pk).recalculate_totals()
+        return items
 
     def __str__(self):
         return f"Cart #{self.id}"
 
+class CartItemQuerySet(models.QuerySet):
+    def reprice(self):
+        """Refresh total_price from the current meal prices, set-based."""
+        price = Subquery(Meal.objects.filter(pk=OuterRef('meal_id')).values('price')[:1])
+        return self.update(
+            total_price=models.ExpressionWrapper(
+                price * F('quantity') * F('portions') * F('plates'),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            )
+        )
+
+
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, related_name='items', on_delete=models.CASCADE)
     meal = models.ForeignKey('api.Meal', on_delete=models.CASCADE)
@@ -23,13 +103,39 @@ class CartItem(models.Model):
     portions = models.PositiveIntegerField(validators=[MinValueValidator(1)], default=1)
     plates = models.PositiveIntegerField(validators=[MinValueValidator(1)], default=1)
     special_instructions = models.TextField(blank=True)
-    
-    @property
-    def total_price(self):
-        return self.meal.price * self.quantity * self.portions * self.plates
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, default=ZERO)
+
+    objects = CartItemQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored line total so save() can apply just the delta
+        instance._saved_total = instance.__dict__.get('total_price')
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.total_price = self.meal.price * self.quantity * self.portions * self.plates
+        adding = self._state.adding
+        with transaction.atomic(savepoint=False):
+            if adding:
+                previous = ZERO
+            elif getattr(self, '_saved_total', None) is not None:
+                previous = self._saved_total
+            else:
+                previous = CartItem.objects.filter(pk=self.pk).values_list('total_price', flat=True).first() or ZERO
+            super().save(*args, **kwargs)
+            Cart.adjust_totals(self.cart_id, self.total_price - previous, 1 if adding else 0)
+        self._saved_total = self.total_price
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(savepoint=False):
+            result = super().delete(*args, **kwargs)
+            Cart.adjust_totals(self.cart_id, -self.total_price, -1)
+        return result
 
     def __str__(self):
         return f"{self.quantity}x{self.portions}p{self.plates}pl {self.meal.name}"
 
     class Meta:
-        unique_together = ['cart', 'meal'] 
\ No newline at end of file
+        unique_together = ['cart', 'meal']
@@ -1,17 +1,35 @@
 from django.db import models
 from django.core.validators import MinValueValidator
 
+from ..images import current_variants
+
 class Meal(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
     image = models.ImageField(upload_to='meals/')
+    # {'source': <image name>, 'sizes': {'thumb'|'medium'|'full': ...}}; see api/images.py
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_available = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the post_save hooks tell a new image or price from any other edit
+        instance._saved_image = instance.__dict__.get('image')
+        instance._saved_price = instance.__dict__.get('price')
+        return instance
+
+    def current_variants(self):
+        return current_variants(self.image, self.image_variants)
+
     def __str__(self):
         return self.name
 
     class Meta:
-        ordering = ['-created_at'] 
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['is_available', '-created_at', '-id'], name='meal_available_created_idx'),
+        ] 
\ No newline at end of file
@@ -73,6 +73,7 @@ class GiftDetails(models.Model):
 
 class Order(models.Model):
     STATUS_CHOICES = [
+        ('accepted', 'Accepted'),  # Cart reserved, items not yet materialized by the worker
         ('pending', 'Pending'),
         ('paid', 'Paid'),
         ('preparing', 'Preparing'),
@@ -89,12 +90,32 @@ class Order(models.Model):
     gift_details = models.OneToOneField(GiftDetails, on_delete=models.SET_NULL, null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
-    payment_intent_id = models.CharField(max_length=255, blank=True)
+    # Indexed for webhook lookups
+    payment_intent_id = models.CharField(max_length=255, blank=True, db_index=True)
+    # Cart lines and gift details captured at checkout, cleared once materialized
+    pending_checkout = models.JSONField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+            # Only the few orders still waiting for the worker (see checkout.unprocessed_orders),
+            # for the stale-order sweep
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(status='accepted') | models.Q(status='pending', payment_intent_id=''),
+                name='order_unprocessed_idx',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the post_save hook tell a status transition from any other edit
+        instance._saved_status = instance.__dict__.get('status')
+        return instance
 
     def __str__(self):
         return f"Order #{self.id}"
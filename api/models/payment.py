@@ -0,0 +1,17 @@
+from django.db import models
+
+
+class PaymentEvent(models.Model):
+    """A verified Stripe webhook event, applied to orders in batches."""
+    stripe_event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payment_intent_id = models.CharField(max_length=255, blank=True)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.type} {self.stripe_event_id}"
@@ -0,0 +1,16 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Cursor pagination ordered by ``(created_at, id)``, newest first. DRF
+    filters on the first ordering field only (``created_at < position``) and
+    skips the rows that share the cursor's timestamp with an offset, so a
+    page is a range scan of the composite indexes on ``Meal`` and ``Order``
+    plus those tied rows, not of everything scrolled past. Timestamps are
+    microsecond-precise, so ties are rare; ``id`` keeps the order total.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
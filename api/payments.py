@@ -0,0 +1,190 @@
+"""
+Stripe payments, kept off the request thread.
+
+Payment intents are created by the ``process_order`` worker through one
+pooled keep-alive HTTP session per process, with an idempotency key per
+order so retries never double-charge. Webhooks are only verified and
+stored by the request; ``apply_payment_events`` applies them in batches.
+"""
+import logging
+import os
+import threading
+from datetime import timedelta
+from decimal import Decimal
+
+import requests
+import stripe
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+from .events import publish_order_status
+from .models import Order, PaymentEvent
+
+logger = logging.getLogger(__name__)
+
+# Stripe event type -> (order status, statuses it may move from)
+TRANSITIONS = {
+    'payment_intent.succeeded': ('paid', {'accepted', 'pending'}),
+    'payment_intent.canceled': ('cancelled', {'accepted', 'pending'}),
+}
+APPLY_SCHEDULED_KEY = 'payments:apply-scheduled'
+# How long an event whose order can't be found yet keeps being retried
+UNMATCHED_EVENT_TTL = timedelta(days=1)
+
+_http_client = None
+_http_pid = None
+_configure_lock = threading.Lock()
+
+
+def configure():
+    """Point the stripe module at a pooled HTTP client, once per process."""
+    global _http_client, _http_pid
+    stripe.api_base = settings.STRIPE_API_BASE
+    stripe.max_network_retries = 2
+    with _configure_lock:
+        # Pooled sockets must not be shared across a fork
+        if _http_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.STRIPE_HTTP_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _http_client = stripe.http_client.RequestsClient(timeout=settings.STRIPE_TIMEOUT, session=session)
+            _http_pid = os.getpid()
+        stripe.default_http_client = _http_client
+
+
+def idempotency_key(order):
+    return f'order-{order.pk}-payment-intent'
+
+
+def create_payment_intent(order):
+    configure()
+    intent = stripe.PaymentIntent.create(
+        amount=int(order.total_amount * 100),
+        currency=settings.STRIPE_CURRENCY,
+        metadata={'order_id': order.pk},
+        api_key=settings.STRIPE_SECRET_KEY,
+        idempotency_key=idempotency_key(order),
+    )
+    Order.objects.filter(pk=order.pk).update(payment_intent_id=intent.id)
+    order.payment_intent_id = intent.id
+    return intent
+
+
+def retrieve_payment_intent(order):
+    configure()
+    return stripe.PaymentIntent.retrieve(order.payment_intent_id, api_key=settings.STRIPE_SECRET_KEY)
+
+
+def verify_event(payload, signature):
+    """The Stripe event in ``payload``; raises ValueError or SignatureVerificationError."""
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        # Fail closed rather than verify against an empty or guessable secret
+        raise ValueError('STRIPE_WEBHOOK_SECRET is not set')
+    return stripe.Webhook.construct_event(payload, signature, settings.STRIPE_WEBHOOK_SECRET)
+
+
+def record_event(event):
+    """Store a verified event for the next batch. Redeliveries are ignored."""
+    intent = event['data']['object']
+    PaymentEvent.objects.bulk_create([
+        PaymentEvent(
+            stripe_event_id=event['id'],
+            type=event['type'],
+            payment_intent_id=intent.get('id', '') if intent.get('object') == 'payment_intent' else '',
+            payload=event.to_dict() if hasattr(event, 'to_dict') else dict(event),
+        )
+    ], ignore_conflicts=True)
+    transaction.on_commit(schedule_apply)
+
+
+def schedule_apply():
+    from .tasks import apply_payment_events
+
+    # One pending batch at a time; events arriving meanwhile ride along
+    window = settings.PAYMENT_EVENT_BATCH_WINDOW
+    if cache.add(APPLY_SCHEDULED_KEY, 1, window + 60):
+        apply_payment_events.apply_async(countdown=window)
+
+
+def _metadata_order_id(event):
+    order_id = event.payload['data']['object'].get('metadata', {}).get('order_id')
+    return int(order_id) if str(order_id or '').isdigit() else None
+
+
+def apply_events(batch_size=500):
+    """
+    Apply unprocessed payment events to their orders, a batch at a time:
+    one lookup of the affected orders by the indexed payment_intent_id (or
+    the intent's ``metadata.order_id``, for events that beat the worker
+    storing the intent id) and one update per target status. Events whose
+    order can't be found yet stay unprocessed and are retried by the next
+    batch (at the latest the periodic one in CELERY_BEAT_SCHEDULE) until
+    UNMATCHED_EVENT_TTL. Returns the number of orders changed.
+    """
+    changed = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            events = list(
+                PaymentEvent.objects.filter(processed_at=None, id__gt=last_id).order_by('id')[:batch_size]
+            )
+            if not events:
+                break
+            last_id = events[-1].pk
+
+            # The latest event per intent decides
+            latest = {}
+            for event in sorted(events, key=lambda event: event.payload.get('created', 0)):
+                if event.type in TRANSITIONS and event.payment_intent_id:
+                    latest[event.payment_intent_id] = event
+            by_order_id = {
+                order_id: event for event in latest.values()
+                if (order_id := _metadata_order_id(event)) is not None
+            }
+            orders = Order.objects.filter(
+                Q(payment_intent_id__in=latest) | Q(pk__in=by_order_id, payment_intent_id='')
+            ).only('id', 'user_id', 'status', 'total_amount', 'payment_intent_id', 'updated_at')
+
+            updates = {}
+            for order in orders:
+                event = latest.pop(order.payment_intent_id or by_order_id[order.pk].payment_intent_id, None)
+                if event is None:
+                    continue
+                target, sources = TRANSITIONS[event.type]
+                if order.status not in sources:
+                    continue
+                intent = event.payload['data']['object']
+                if target == 'paid' and Decimal(intent.get('amount_received', 0)) < order.total_amount * 100:
+                    logger.warning('Ignoring underpaid intent %s for order %s', order.payment_intent_id, order.pk)
+                    continue
+                updates.setdefault(event.type, []).append(order)
+            now = timezone.now()
+            unmatched = set()
+            for intent_id, event in latest.items():
+                if event.received_at > now - UNMATCHED_EVENT_TTL:
+                    unmatched.add(event.pk)
+                else:
+                    logger.warning('No order for payment intent %s, dropping %s', intent_id, event.stripe_event_id)
+
+            for event_type, targets in updates.items():
+                target, sources = TRANSITIONS[event_type]
+                updated = Order.objects.filter(
+                    pk__in=[order.pk for order in targets], status__in=sources
+                ).update(status=target, updated_at=now)
+                changed += updated
+                if target == 'paid':
+                    metrics.inc('payment_confirmations_total', updated, source='webhook')
+                # update() skips post_save, so announce the transitions here
+                for order in targets:
+                    order.status, order.updated_at = target, now
+                    publish_order_status(order)
+            PaymentEvent.objects.filter(
+                pk__in=[event.pk for event in events if event.pk not in unmatched]
+            ).update(processed_at=now)
+    return changed
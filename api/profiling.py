@@ -0,0 +1,227 @@
+"""
+Per-request profiling for staff, switched on by an ``X-Profile: 1`` header.
+
+A profiled request records every SQL statement (grouped by its normalized
+text), time spent producing serializer ``.data`` and time spent rendering
+the response, and reports them in a ``Server-Timing`` header that browser
+devtools display. Statements repeated with different parameters within one
+request (the N+1 pattern) or with the same ones are flagged, and the full
+breakdown is logged to ``api.profiling``.
+
+Nothing is profiled without the request header, or when the requester is
+already known not to be staff: a non-staff session user, a bearer token that
+doesn't authenticate a staff user, or no credentials at all. The header and
+the log line are still only added once the view has run, for staff.
+``PROFILING_ENABLED=false`` turns the middleware into a pass-through.
+
+Serializer timing patches ``BaseSerializer.data`` for the whole process;
+``install()`` does that from ``ApiConfig.ready()`` when profiling is enabled.
+"""
+import logging
+import re
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from rest_framework.exceptions import APIException
+from rest_framework.serializers import BaseSerializer
+
+from .authentication import CachedJWTAuthentication
+
+logger = logging.getLogger(__name__)
+
+current_profile = ContextVar('current_profile', default=None)
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_LIST = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """``... WHERE id IN (%s, %s) AND name = 'x'`` -> ``... WHERE id IN (...) AND name = ?``."""
+    sql = STRING_LITERAL.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    sql = PLACEHOLDER_LIST.sub('(...)', sql.replace('%s', '?'))
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryGroup:
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.ms = 0.0
+        self.params = set()
+        self.exact_repeats = 0
+
+    @property
+    def suspect(self):
+        # The same statement over and over within one request
+        return self.count >= settings.PROFILING_DUPLICATE_THRESHOLD
+
+
+class Profile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = {}
+        self.db_ms = 0.0
+        self.serialize_ms = 0.0
+        self.render_started = None
+        self.render_ms = 0.0
+        self.total_ms = 0.0
+        self._serializing = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.db_ms += elapsed
+            key = normalize_sql(sql)
+            group = self.queries.get(key)
+            if group is None:
+                group = self.queries[key] = QueryGroup(key)
+            group.count += 1
+            group.ms += elapsed
+            try:
+                signature = repr(params)
+            except Exception:
+                signature = None
+            if signature in group.params:
+                group.exact_repeats += 1
+            group.params.add(signature)
+
+    @property
+    def query_count(self):
+        return sum(group.count for group in self.queries.values())
+
+    def suspects(self):
+        return sorted((group for group in self.queries.values() if group.suspect), key=lambda group: -group.count)
+
+    def server_timing(self):
+        app_ms = max(0.0, self.total_ms - self.db_ms - self.serialize_ms - self.render_ms)
+        entries = [
+            f'db;dur={self.db_ms:.1f};desc="{self.query_count} queries"',
+            f'serialize;dur={self.serialize_ms:.1f}',
+            f'render;dur={self.render_ms:.1f}',
+            f'app;dur={app_ms:.1f}',
+            f'total;dur={self.total_ms:.1f}',
+        ]
+        suspects = self.suspects()
+        if suspects:
+            entries.append(f'nplus1;desc="{len(suspects)} repeated statements"')
+        slowest = sorted(self.queries.values(), key=lambda group: -group.ms)[:settings.PROFILING_TOP_QUERIES]
+        for index, group in enumerate(slowest, 1):
+            flag = 'N+1? ' if group.suspect else ''
+            entries.append(f'sql{index};dur={group.ms:.1f};desc="{flag}x{group.count} {describe(group.sql)}"')
+        return ', '.join(entries)
+
+    def log(self, request):
+        lines = [
+            f'{request.method} {request.path}: {self.total_ms:.1f}ms total, {self.query_count} queries '
+            f'{self.db_ms:.1f}ms, serialize {self.serialize_ms:.1f}ms, render {self.render_ms:.1f}ms'
+        ]
+        for group in sorted(self.queries.values(), key=lambda group: -group.ms):
+            flag = ' [N+1?]' if group.suspect else ''
+            repeats = f', {group.exact_repeats} exact repeats' if group.exact_repeats else ''
+            lines.append(f'  x{group.count} {group.ms:.1f}ms{repeats}{flag}: {group.sql}')
+        logger.info('\n'.join(lines))
+
+
+def describe(sql, limit=120):
+    # Header-safe: no quotes or backslashes inside a quoted-string
+    sql = sql.replace('"', '').replace('\\', '')
+    return sql if len(sql) <= limit else sql[:limit - 3] + '...'
+
+
+def _profiled_data(fget):
+    def data(serializer):
+        profile = current_profile.get()
+        # Only the outermost serializer counts; nested ones are inside its time
+        if profile is None or profile._serializing:
+            return fget(serializer)
+        profile._serializing += 1
+        started = time.perf_counter()
+        try:
+            return fget(serializer)
+        finally:
+            profile._serializing -= 1
+            profile.serialize_ms += (time.perf_counter() - started) * 1000
+    data.profiled = True
+    return data
+
+
+def install():
+    """Time serializer ``.data``; a no-op for requests that aren't profiled."""
+    if not getattr(BaseSerializer.data.fget, 'profiled', False):
+        BaseSerializer.data = property(_profiled_data(BaseSerializer.data.fget))
+
+
+class ProfilingMiddleware:
+    """See the module docstring. Async requests (event streams) pass through unprofiled."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.PROFILING_ENABLED
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def wants_profile(self, request):
+        return self.enabled and request.headers.get('X-Profile') == '1' and self.could_be_staff(request)
+
+    def could_be_staff(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            # A session login, already resolved by AuthenticationMiddleware
+            return user.is_staff
+        if not request.headers.get('Authorization'):
+            return False
+        # DRF authenticates only inside the view; check the token up front (the principal is cached)
+        try:
+            result = CachedJWTAuthentication().authenticate(request)
+        except APIException:
+            return False
+        return result is not None and result[0].is_staff
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.wants_profile(request):
+            return self.get_response(request)
+
+        profile = Profile()
+        token = current_profile.set(profile)
+        try:
+            with ExitStack() as stack:
+                # Every alias, including ones this request opens for the first time
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.record_query))
+                response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        if profile.render_started is not None:
+            profile.render_ms = (time.perf_counter() - profile.render_started) * 1000
+        profile.total_ms = (time.perf_counter() - profile.started) * 1000
+
+        # DRF has authenticated the request by now
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            response['Server-Timing'] = profile.server_timing()
+            profile.log(request)
+        return response
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def process_template_response(self, request, response):
+        # Runs just before the response is rendered
+        profile = current_profile.get()
+        if profile is not None:
+            profile.render_started = time.perf_counter()
+        return response
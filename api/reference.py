@@ -0,0 +1,53 @@
+"""
+Delivery types and locations change maybe once a term, so reads come from
+the tiered cache and writes invalidate it (see signals).
+"""
+from django.core.cache import caches
+from django.db import transaction
+
+from . import metrics
+from .replicas import use_primary
+from .models import DeliveryType, Location
+
+REFERENCE_TIMEOUT = 60 * 60
+DELIVERY_TYPES_KEY = 'reference:delivery-types'
+LOCATIONS_KEY = 'reference:locations'
+
+
+def _cached_list(key, queryset):
+    cache = caches['tiered']
+    rows = cache.get(key)
+    metrics.cache_lookup('reference', rows is not None)
+    if rows is None:
+        with use_primary():
+            rows = list(queryset)
+        cache.set(key, rows, timeout=REFERENCE_TIMEOUT)
+    return rows
+
+
+def get_delivery_types():
+    return _cached_list(DELIVERY_TYPES_KEY, DeliveryType.objects.order_by('id'))
+
+
+def get_locations():
+    return _cached_list(LOCATIONS_KEY, Location.objects.order_by('id'))
+
+
+def find_by_pk(rows, pk):
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    return next((row for row in rows if row.pk == pk), None)
+
+
+def get_delivery_type(pk):
+    return find_by_pk(get_delivery_types(), pk)
+
+
+def get_location(pk):
+    return find_by_pk(get_locations(), pk)
+
+
+def invalidate_reference(key):
+    transaction.on_commit(lambda: caches['tiered'].delete(key))
@@ -0,0 +1,92 @@
+"""
+Read-replica routing with read-your-writes stickiness.
+
+Everything goes to ``default`` unless a view opts in with ReplicaReadMixin:
+safe requests to its ``replica_actions`` then read from one of
+REPLICA_DATABASES. A successful write through such a view pins the user to
+the primary for REPLICA_PIN_SECONDS, via the shared cache so the pin holds
+on every worker, which covers the replica lag for their next reads.
+
+Reads that fill shared caches (menu snapshots, reference data) run under
+``use_primary()``: a lagging row cached after an invalidation would outlive
+the lag by the whole cache timeout.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+PRIMARY = 'default'
+
+_read_from = ContextVar('replica_read_from', default=None)
+
+
+def pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def pin(user):
+    if settings.REPLICA_DATABASES and user.is_authenticated:
+        cache.set(pin_key(user.pk), 1, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    return user.is_authenticated and cache.get(pin_key(user.pk)) is not None
+
+
+@contextmanager
+def use_primary():
+    token = _read_from.set(None)
+    try:
+        yield
+    finally:
+        _read_from.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_from.get() or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        # Never the instance's own alias, which may be the replica it was read from
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {PRIMARY, *settings.REPLICA_DATABASES}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """See the module docstring. Actions outside ``replica_actions`` only pin."""
+    replica_actions = {'list', 'retrieve'}
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # After authentication, so the user's pin can be checked
+        if (
+            settings.REPLICA_DATABASES
+            and self.action in self.replica_actions
+            and request.method in SAFE_METHODS
+            and not is_pinned(request.user)
+        ):
+            # One replica for the whole request, so its reads are consistent
+            self._replica_token = _read_from.set(random.choice(settings.REPLICA_DATABASES))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _read_from.reset(token)
+            self._replica_token = None
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,202 @@
+import bisect
+import difflib
+import re
+import unicodedata
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+from .menu import get_menu_version
+
+MAX_RESULTS = 100
+MAX_TERMS = 8
+VOCABULARY_TIMEOUT = 60 * 60
+CORRECTION_CUTOFF = 0.75
+
+# {candidates} narrows the matches to a queryset (say, available meals) before
+# the LIMIT, so filtered-out rows can't crowd the rest out of the top results
+SQLITE_SEARCH_SQL = """
+    SELECT rowid FROM api_meal_fts
+    WHERE api_meal_fts MATCH %s{candidates}
+    ORDER BY bm25(api_meal_fts, 10.0, 1.0)
+    LIMIT %s
+"""
+
+# The WHERE expression must match the GIN index from migration 0004
+POSTGRES_SEARCH_SQL = """
+    SELECT id FROM api_meal
+    WHERE to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))
+          @@ to_tsquery('simple', %s){candidates}
+    ORDER BY ts_rank(
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'B'),
+        to_tsquery('simple', %s)
+    ) DESC
+    LIMIT %s
+"""
+
+
+def tokenize(text):
+    # Mirror the index tokenizer: lowercase with diacritics removed
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return re.findall(r'\w+', text)[:MAX_TERMS]
+
+
+def _load_vocabulary():
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('SELECT term FROM api_meal_fts_vocab')
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT word FROM ts_stat('SELECT to_tsvector(''simple'', "
+                "coalesce(name, '''') || '' '' || coalesce(description, '''')) FROM api_meal')"
+            )
+        else:
+            return []
+        # Numbers are never worth spell-correcting towards
+        return sorted(row[0] for row in cursor.fetchall() if row[0].isalpha())
+
+
+_vocabulary = (None, [])
+
+
+def get_vocabulary():
+    # Terms only change with the menu, so piggyback on its version and keep
+    # a decoded copy in-process to avoid unpickling it on every keystroke.
+    global _vocabulary
+    version = get_menu_version()
+    if _vocabulary[0] == version:
+        return _vocabulary[1]
+    key = f'meal-search:vocab:{version}'
+    vocabulary = cache.get(key)
+    if vocabulary is None:
+        vocabulary = _load_vocabulary()
+        cache.set(key, vocabulary, timeout=VOCABULARY_TIMEOUT)
+    _vocabulary = (version, vocabulary)
+    return vocabulary
+
+
+def _has_prefix(vocabulary, term):
+    index = bisect.bisect_left(vocabulary, term)
+    return index < len(vocabulary) and vocabulary[index].startswith(term)
+
+
+def correct(term, vocabulary):
+    """Closest indexed term for a misspelling such as "jolof" -> "jollof"."""
+    candidates = [
+        word for word in vocabulary
+        if word[:1] == term[:1] and abs(len(word) - len(term)) <= 2
+    ]
+    matches = difflib.get_close_matches(term, candidates, n=1, cutoff=CORRECTION_CUTOFF)
+    return matches[0] if matches else None
+
+
+def plan_query(text):
+    """
+    Turn user input into ``[(term, is_prefix), ...]``. The last term is a
+    prefix (typeahead); unknown terms are replaced by their closest spelling.
+    """
+    terms = tokenize(text)
+    if not terms:
+        return []
+    vocabulary = get_vocabulary()
+    plan = []
+    for position, term in enumerate(terms):
+        is_prefix = position == len(terms) - 1
+        if is_prefix and _has_prefix(vocabulary, term):
+            plan.append((term, True))
+            continue
+        index = bisect.bisect_left(vocabulary, term)
+        if index < len(vocabulary) and vocabulary[index] == term:
+            plan.append((term, False))
+            continue
+        plan.append((correct(term, vocabulary) or term, False))
+    return plan
+
+
+def _fts5_query(plan):
+    return ' '.join(f'"{term}"*' if is_prefix else f'"{term}"' for term, is_prefix in plan)
+
+
+def _tsquery(plan):
+    return ' & '.join(f'{term}:*' if is_prefix else term for term, is_prefix in plan)
+
+
+def _candidates(queryset):
+    """SQL narrowing the ranked matches to ``queryset``, with its params."""
+    if queryset is None:
+        return '', []
+    queryset = queryset.order_by().values('id')
+    if connection.vendor == 'sqlite':
+        # A primary key probe per match; with ``rowid IN (...)`` SQLite reads every
+        # candidate id and FTS5 may run the MATCH once per id
+        sql, params = queryset.filter(pk=RawSQL('api_meal_fts.rowid', [])).query.sql_with_params()
+        return f' AND EXISTS ({sql})', list(params)
+    # Postgres plans this as a semi-join
+    sql, params = queryset.query.sql_with_params()
+    return f' AND id IN ({sql})', list(params)
+
+
+def search_meal_ids(text, limit=MAX_RESULTS, queryset=None):
+    """Ranked meal ids for ``text``, best match first, among ``queryset`` if given."""
+    plan = plan_query(text)
+    if not plan:
+        return []
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            candidates, params = _candidates(queryset)
+            cursor.execute(
+                SQLITE_SEARCH_SQL.format(candidates=candidates), [_fts5_query(plan), *params, limit]
+            )
+        elif connection.vendor == 'postgresql':
+            query = _tsquery(plan)
+            candidates, params = _candidates(queryset)
+            cursor.execute(
+                POSTGRES_SEARCH_SQL.format(candidates=candidates), [query, *params, query, limit]
+            )
+        else:
+            return None
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_meals(queryset, text, limit=MAX_RESULTS):
+    ids = search_meal_ids(text, limit, queryset)
+    if ids is None:
+        # No full-text index on this backend, fall back to LIKE scans
+        for term in tokenize(text):
+            queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+        return queryset[:limit]
+    if not ids:
+        return queryset.none()
+    # A single positional expression; a CASE per id costs more to compile
+    # than the search itself.
+    if connection.vendor == 'sqlite':
+        ranking = RawSQL("instr(%s, ',' || api_meal.id || ',')", [',%s,' % ','.join(map(str, ids))])
+    else:
+        ranking = RawSQL('array_position(%s::bigint[], api_meal.id)', [ids])
+    return queryset.filter(id__in=ids).order_by(ranking)
+
+
+class MealSearchFilter(BaseFilterBackend):
+    """Full-text replacement for ``SearchFilter`` on meals, ranked by relevance."""
+    search_param = api_settings.SEARCH_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '').strip()
+        if not text:
+            return queryset
+        return search_meals(queryset, text)
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Full-text search over meal names and descriptions.',
+            'schema': {'type': 'string'},
+        }]
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from .images import srcset, variant_urls
 from .models import (
     Meal, Order, OrderItem, DeliveryType, 
     Location, GiftDetails, Cart, CartItem, UserProfile
@@ -8,9 +9,19 @@ from .models import (
 User = get_user_model()
 
 class MealSerializer(serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     class Meta:
         model = Meal
-        fields = ['id', 'name', 'description', 'price', 'image', 'is_available']
+        fields = ['id', 'name', 'description', 'price', 'image', 'image_variants', 'image_srcset', 'is_available']
+
+    def get_image_variants(self, obj):
+        # {'thumb'|'medium'|'full': {'width', 'height', 'jpeg', 'webp'}}; empty until processed
+        return variant_urls(obj.current_variants(), self.context.get('request'))
+
+    def get_image_srcset(self, obj):
+        # {'jpeg': 'url 300w, ...', 'webp': ...}, ready for <source srcset>
+        return srcset(obj.current_variants(), self.context.get('request'))
 
 class DeliveryTypeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -38,11 +49,12 @@ class CartItemSerializer(serializers.ModelSerializer):
 
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
-    total_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    total_amount = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
 
     class Meta:
         model = Cart
-        fields = ['id', 'items', 'total_amount']
+        fields = ['id', 'items', 'item_count', 'total_amount']
+        read_only_fields = ['item_count']
 
 class OrderItemSerializer(serializers.ModelSerializer):
     meal = MealSerializer(read_only=True)
@@ -82,9 +94,10 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
 class UserSerializer(serializers.ModelSerializer):
     profile_image = serializers.SerializerMethodField()
+    profile_image_variants = serializers.SerializerMethodField()
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'profile_image']
+        fields = ['id', 'username', 'email', 'profile_image', 'profile_image_variants']
         read_only_fields = ['id'] 
 
     def get_profile_image(self, obj):
@@ -94,4 +107,10 @@ class UserSerializer(serializers.ModelSerializer):
             if request is not None:
                 return request.build_absolute_uri(url)
             return url
-        return None 
\ No newline at end of file
+        return None
+
+    def get_profile_image_variants(self, obj):
+        # {'small'|'medium'|'large': {'width', 'height', 'jpeg', 'webp'}}; empty until processed
+        if not hasattr(obj, 'profile'):
+            return {}
+        return variant_urls(obj.profile.current_variants(), self.context.get('request'))
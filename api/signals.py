@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .authentication import invalidate_principal
+from .events import publish_order_status
+from .menu import invalidate_menu
+from .models import Cart, CartItem, DeliveryType, Location, Meal, Order, UserProfile
+from .reference import DELIVERY_TYPES_KEY, LOCATIONS_KEY, invalidate_reference
+
+
+@receiver(post_save, sender=Meal)
+@receiver(post_delete, sender=Meal)
+def meal_changed(sender, **kwargs):
+    invalidate_menu()
+
+
+@receiver(post_save, sender=Meal)
+def reprice_carts(sender, instance, created, update_fields, **kwargs):
+    # Carts show current prices, so a price edit moves their stored totals;
+    # availability, description and image saves leave them alone
+    if update_fields is not None and 'price' not in update_fields:
+        return
+    if not created and instance.price != getattr(instance, '_saved_price', None):
+        CartItem.objects.filter(meal=instance).reprice()
+        Cart.objects.filter(items__meal=instance).recalculate_totals()
+    instance._saved_price = instance.price
+
+
+@receiver(pre_delete, sender=Meal)
+def remember_carts(sender, instance, **kwargs):
+    instance._cart_ids = list(Cart.objects.filter(items__meal=instance).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Meal)
+def drop_deleted_meal_from_carts(sender, instance, **kwargs):
+    # The cascade removed the cart lines without going through CartItem.delete()
+    cart_ids = getattr(instance, '_cart_ids', None)
+    if cart_ids:
+        Cart.objects.filter(id__in=cart_ids).recalculate_totals()
+
+
+@receiver(post_save, sender=DeliveryType)
+@receiver(post_delete, sender=DeliveryType)
+def delivery_type_changed(sender, **kwargs):
+    invalidate_reference(DELIVERY_TYPES_KEY)
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def location_changed(sender, **kwargs):
+    invalidate_reference(LOCATIONS_KEY)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+    # Covers password changes and deactivation, from the API or the admin
+    invalidate_principal(instance.pk)
+
+
+@receiver(post_save, sender=Order)
+def order_status_changed(sender, instance, created, **kwargs):
+    if created or instance.status != getattr(instance, '_saved_status', None):
+        publish_order_status(instance)
+    instance._saved_status = instance.status
+
+
+@receiver(post_save, sender=UserProfile)
+def profile_image_changed(sender, instance, **kwargs):
+    from .tasks import generate_profile_variants, queue_image_task
+
+    name = instance.profile_image.name if instance.profile_image else None
+    if name and name != getattr(instance, '_saved_image', None):
+        transaction.on_commit(lambda: queue_image_task(generate_profile_variants, instance.pk))
+    instance._saved_image = name
+
+
+@receiver(post_save, sender=Meal)
+def meal_image_changed(sender, instance, **kwargs):
+    from .tasks import generate_meal_variants, queue_image_task
+
+    name = instance.image.name if instance.image else None
+    if name and name != getattr(instance, '_saved_image', None):
+        transaction.on_commit(lambda: queue_image_task(generate_meal_variants, instance.pk))
+    instance._saved_image = name
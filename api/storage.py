@@ -0,0 +1,82 @@
+"""
+Media storage that names files by their content.
+
+``meals/Americano.jpg`` is stored as ``meals/3f/3f9c...e1.jpg`` (the first
+32 hex digits of its SHA-256), so saving the same bytes twice, under any
+name, yields one file. Nothing deletes blobs on its own; ``gc_media`` sweeps
+the ones no row references any more.
+
+Static files use WhiteNoise's compressed manifest storage, made lenient
+about files missing from the manifest.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+HASHED_NAME = re.compile(r'(^|/)([0-9a-f]{2})/\2[0-9a-f]{30}(\.\w+)?$')
+
+
+def is_content_addressed(name):
+    return bool(HASHED_NAME.search(name))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk.encode() if isinstance(chunk, str) else chunk)
+        digest = digest.hexdigest()[:32]
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(posixpath.dirname(name), digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # A fresh mtime keeps gc_media's grace period from sweeping a blob just reused
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # The name is the content, so an existing file is the same file
+        return name
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        # Write aside and rename, so readers never see half a file and
+        # concurrent saves of the same content just replace each other
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk.encode() if isinstance(chunk, str) else chunk)
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+
+class LenientManifestStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    manifest_strict = False
+
+    def stored_name(self, name):
+        # Unhashed URLs rather than a 500 on every page when collectstatic hasn't run
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .events import FINAL_STATUSES, format_event, get_hub, order_event
+from .models import Order
+
+HEARTBEAT_SECONDS = 15
+# Streams end after this long and the client reconnects (see 'retry'), which
+# bounds how long a connection outlives a revoked token
+STREAM_MAX_SECONDS = 300
+RETRY_MS = 3000
+SNAPSHOT_LIMIT = 50
+
+
+def authenticate_stream(request):
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except exceptions.AuthenticationFailed:
+        return None
+    return user if user.is_authenticated else None
+
+
+def open_orders(user, order_id=None):
+    orders = Order.objects.filter(user=user).only('id', 'status', 'updated_at')
+    if order_id is not None:
+        return list(orders.filter(pk=order_id))
+    return list(orders.exclude(status__in=FINAL_STATUSES)[:SNAPSHOT_LIMIT])
+
+
+async def order_events(request):
+    """
+    GET /api/orders/events/[?order=<id>] as text/event-stream.
+
+    Sends the current status of the user's open orders (or just ``order``)
+    and then a ``status`` event for every transition. Replaces polling
+    /api/orders/{id}/; needs an ASGI server to hold connections cheaply.
+    """
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI Django drains the whole stream before sending any of it,
+        # holding a sync worker for STREAM_MAX_SECONDS
+        return JsonResponse(
+            {'detail': 'Event streams need the ASGI server; poll /api/orders/{id}/ instead.'}, status=501
+        )
+    user = await sync_to_async(authenticate_stream)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    order_id = request.GET.get('order')
+    if order_id is not None and not order_id.isdigit():
+        return JsonResponse({'detail': 'order must be an order id.'}, status=400)
+    order_id = int(order_id) if order_id else None
+
+    # Subscribe before reading so no transition falls between the two
+    subscription = get_hub().subscribe(user.pk)
+    orders = await sync_to_async(open_orders)(user, order_id)
+    if order_id is not None and not orders:
+        subscription.close()
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+
+    response = StreamingHttpResponse(
+        stream_events(subscription, [order_event(order) for order in orders], order_id),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def stream_events(subscription, snapshot, order_id=None):
+    with subscription:
+        yield f'retry: {RETRY_MS}\n\n'
+        for event in snapshot:
+            yield format_event(event)
+        if order_id is not None and snapshot[0]['status'] in FINAL_STATUSES:
+            return
+
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                event = await subscription.get(min(HEARTBEAT_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if order_id is not None and event['id'] != order_id:
+                continue
+            yield format_event(event)
+            if order_id is not None and event['status'] in FINAL_STATUSES:
+                return
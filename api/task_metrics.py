@@ -0,0 +1,96 @@
+"""
+Queue depth and task latency for the Celery pipeline.
+
+Counters live in the default cache so every worker and web process adds to
+the same totals: per task, the number of runs, the summed and worst time
+spent waiting in the queue (publish -> start) and running.
+"""
+import threading
+import time
+
+from celery.signals import before_task_publish, task_postrun, task_prerun
+from django.core.cache import cache
+from kombu.exceptions import ChannelError
+
+from foodapp.celery import app
+
+PREFIX = 'task-metrics'
+FIELDS = ('count', 'failures', 'wait_ms_total', 'wait_ms_max', 'run_ms_total', 'run_ms_max')
+
+_started = {}
+_lock = threading.Lock()
+
+
+def _key(task_name, field):
+    return f'{PREFIX}:{task_name}:{field}'
+
+
+def _incr(key, delta):
+    cache.add(key, 0, None)
+    cache.incr(key, delta)
+
+
+def _max(key, value):
+    # Racy between processes, but only ever under-reports a peak
+    if value > (cache.get(key) or 0):
+        cache.set(key, value, None)
+
+
+def record(task_name, run_ms, wait_ms=None, failed=False):
+    _incr(_key(task_name, 'count'), 1)
+    if failed:
+        _incr(_key(task_name, 'failures'), 1)
+    _incr(_key(task_name, 'run_ms_total'), int(run_ms))
+    _max(_key(task_name, 'run_ms_max'), int(run_ms))
+    if wait_ms is not None:
+        _incr(_key(task_name, 'wait_ms_total'), int(wait_ms))
+        _max(_key(task_name, 'wait_ms_max'), int(wait_ms))
+    names = cache.get(f'{PREFIX}:tasks') or []
+    if task_name not in names:
+        cache.set(f'{PREFIX}:tasks', sorted(names + [task_name]), None)
+
+
+def task_stats():
+    stats = {}
+    for task_name in cache.get(f'{PREFIX}:tasks') or []:
+        values = cache.get_many([_key(task_name, field) for field in FIELDS])
+        stats[task_name] = {field: values.get(_key(task_name, field), 0) for field in FIELDS}
+    return stats
+
+
+def queue_depth(queue=None):
+    """Messages waiting in ``queue``, or None if the broker can't say."""
+    queue = queue or app.conf.task_default_queue
+    try:
+        with app.connection_for_read() as connection:
+            return connection.default_channel.queue_declare(queue=queue, passive=True).message_count
+    except ChannelError:
+        # Queues only exist once something has been published to them
+        return 0
+    except Exception:
+        return None
+
+
+@before_task_publish.connect
+def stamp_enqueued_at(headers=None, **kwargs):
+    if headers is not None:
+        headers['enqueued_at'] = time.time()
+
+
+@task_prerun.connect
+def start_timer(task_id=None, task=None, **kwargs):
+    with _lock:
+        _started[task_id] = (time.time(), time.perf_counter())
+
+
+@task_postrun.connect
+def stop_timer(task_id=None, task=None, state=None, **kwargs):
+    with _lock:
+        started = _started.pop(task_id, None)
+    if started is None:
+        return
+    started_at, started_perf = started
+    # Eager tasks are never published, so they have no queue wait
+    enqueued_at = getattr(task.request, 'enqueued_at', None) or (task.request.headers or {}).get('enqueued_at')
+    wait_ms = max(started_at - enqueued_at, 0) * 1000 if enqueued_at else None
+    record(task.name, (time.perf_counter() - started_perf) * 1000, wait_ms, failed=state == 'FAILURE')
@@ -0,0 +1,158 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import stripe
+from celery import Task, shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, connections
+from django.utils import timezone
+
+from . import images, payments
+from .checkout import cancel_unprocessed_order, materialize_order, unprocessed_orders
+from .menu import invalidate_menu
+from .models import Meal, UserProfile
+
+logger = logging.getLogger(__name__)
+
+_image_pool = None
+_image_pool_lock = threading.Lock()
+
+
+def _get_image_pool():
+    global _image_pool
+    with _image_pool_lock:
+        if _image_pool is None:
+            _image_pool = ThreadPoolExecutor(max_workers=settings.IMAGE_TASK_WORKERS, thread_name_prefix='image-task')
+        return _image_pool
+
+
+def _apply_and_close(task, args):
+    try:
+        task.apply(args=args)
+    finally:
+        # Pool threads outlive the task; don't leave their connections open
+        connections.close_all()
+
+
+def queue_image_task(task, *args):
+    """
+    ``task.delay(*args)``, except that with eager Celery (no broker) the task
+    runs on the IMAGE_TASK_WORKERS pool instead of inline, so an upload
+    doesn't wait for Pillow. Returns the pool's future in that case.
+    """
+    if not settings.CELERY_TASK_ALWAYS_EAGER or not settings.IMAGE_TASK_WORKERS:
+        return task.delay(*args)
+    return _get_image_pool().submit(_apply_and_close, task, args)
+
+
+class ProcessOrderTask(Task):
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        # Out of retries: don't leave the customer watching an order that can't be paid
+        order_id = args[0] if args else kwargs.get('order_id')
+        if cancel_unprocessed_order(order_id):
+            logger.error('Cancelled order %s, which could not be processed: %s', order_id, exc)
+
+
+@shared_task(
+    base=ProcessOrderTask,
+    autoretry_for=(OperationalError, stripe.error.APIConnectionError, stripe.error.RateLimitError),
+    retry_backoff=True,
+    retry_backoff_max=60,
+    max_retries=5,
+)
+def process_order(order_id):
+    """Materialize an accepted order and open its payment intent."""
+    order = materialize_order(order_id)
+    if settings.PAYMENT_INTENTS_ENABLED and order.status == 'pending' and not order.payment_intent_id:
+        # Retries reuse the idempotency key, so Stripe hands back the same intent
+        payments.create_payment_intent(order)
+    logger.info('Processed order %s', order_id)
+
+
+@shared_task
+def sweep_unprocessed_orders():
+    """
+    Requeue orders still unprocessed (not materialized, or without a payment
+    intent) ORDER_REQUEUE_AFTER seconds after checkout, because the broker
+    may have lost the message or Stripe failed, and cancel those past
+    ORDER_PROCESSING_DEADLINE. The requeued task reuses the order's
+    idempotency key, so Stripe never opens a second intent. Runs from
+    CELERY_BEAT_SCHEDULE.
+    """
+    now = timezone.now()
+    deadline = now - timedelta(seconds=settings.ORDER_PROCESSING_DEADLINE)
+    stale = unprocessed_orders().filter(
+        created_at__lt=now - timedelta(seconds=settings.ORDER_REQUEUE_AFTER)
+    ).values_list('id', 'created_at')
+    requeued = cancelled = 0
+    for order_id, created_at in stale:
+        if created_at < deadline:
+            if cancel_unprocessed_order(order_id):
+                logger.error('Cancelled order %s, still unprocessed after the deadline', order_id)
+                cancelled += 1
+        # Once per interval, so a backed-up queue doesn't collect duplicates
+        elif cache.add(f'order-requeued:{order_id}', 1, settings.ORDER_REQUEUE_AFTER):
+            process_order.delay(order_id)
+            requeued += 1
+    if requeued or cancelled:
+        logger.warning('Requeued %s and cancelled %s unprocessed orders', requeued, cancelled)
+
+
+@shared_task(autoretry_for=(OperationalError,), retry_backoff=True, max_retries=5)
+def apply_payment_events():
+    # Clear first so events that arrive while we run schedule another batch
+    cache.delete(payments.APPLY_SCHEDULED_KEY)
+    changed = payments.apply_events()
+    logger.info('Applied payment events to %s orders', changed)
+
+
+@shared_task(autoretry_for=(OperationalError,), retry_backoff=True, max_retries=5)
+def generate_profile_variants(profile_id):
+    """Decode a new profile image and store its resized variants."""
+    profile = UserProfile.objects.filter(pk=profile_id).first()
+    if profile is None or not profile.profile_image or profile.current_variants():
+        return
+    name = profile.profile_image.name
+    try:
+        with profile.profile_image.open('rb') as file:
+            sizes = images.build_variants(file, settings.PROFILE_IMAGE_SIZES, 'variants/profile')
+    except FileNotFoundError:
+        logger.warning('Profile image %s is missing from storage', name)
+        return
+    except images.InvalidImage as exc:
+        # Uploads aren't decoded in the request, so this is where bad ones are dropped
+        logger.warning('Dropping undecodable profile image %s: %s', name, exc)
+        if UserProfile.objects.filter(pk=profile_id, profile_image=name).update(profile_image=None, image_variants={}):
+            profile.profile_image.storage.delete(name)
+        return
+    # Skip the write if another upload replaced this one meanwhile
+    UserProfile.objects.filter(pk=profile_id, profile_image=name).update(
+        image_variants={'source': name, 'sizes': sizes}
+    )
+
+
+@shared_task(autoretry_for=(OperationalError,), retry_backoff=True, max_retries=5)
+def generate_meal_variants(meal_id, force=False):
+    """Store the responsive sizes of a meal's image; returns True if it wrote any."""
+    meal = Meal.objects.filter(pk=meal_id).first()
+    if meal is None or not meal.image or (meal.current_variants() and not force):
+        return False
+    name = meal.image.name
+    try:
+        with meal.image.open('rb') as file:
+            sizes = images.build_variants(file, settings.MEAL_IMAGE_SIZES, 'variants/meals')
+    except FileNotFoundError:
+        logger.warning('Meal image %s is missing from storage', name)
+        return False
+    except images.InvalidImage as exc:
+        # Meal images come from staff, so keep the original and leave it to them
+        logger.warning('Cannot build variants of meal image %s: %s', name, exc)
+        return False
+    # update() skips the Meal signals, so the cached menu is dropped by hand
+    if Meal.objects.filter(pk=meal_id, image=name).update(image_variants={'source': name, 'sizes': sizes}):
+        invalidate_menu()
+        return True
+    return False
@@ -0,0 +1,148 @@
+"""
+Token-bucket throttles kept in the 'default' cache. With REDIS_URL that is
+shared, so limits hold across gunicorn workers; the LocMem fallback keeps a
+bucket per process, so N workers let through N times each rate.
+
+Rates use DRF's ``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']`` and format:
+``'10/min'`` is a bucket of 10 tokens refilled at 10 per minute, which
+allows short bursts while holding the long-run average. On Redis the bucket
+is updated atomically by a Lua script; other backends fall back to a
+read-modify-write under a per-process lock.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+TAKE_TOKEN_LUA = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * refill)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+_local_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """'10/min' -> (capacity 10, refill 10/60 tokens per second)."""
+    try:
+        num, period = rate.split('/')
+        capacity = int(num)
+        seconds = PERIODS[period[0]]
+    except (ValueError, KeyError, IndexError):
+        raise ImproperlyConfigured(f'Invalid throttle rate {rate!r}')
+    return capacity, capacity / seconds
+
+
+def take_token(cache, key, capacity, refill, now=None):
+    """Take one token from the bucket at ``key``; returns (allowed, seconds to wait)."""
+    now = time.time() if now is None else now
+    if isinstance(cache, RedisCache):
+        client = cache._cache.get_client(key, write=True)
+        allowed, tokens = client.eval(TAKE_TOKEN_LUA, 1, cache.make_key(key), capacity, refill, now)
+        allowed, tokens = bool(allowed), float(tokens)
+    else:
+        with _local_lock:
+            tokens, ts = cache.get(key) or (capacity, now)
+            tokens = min(capacity, tokens + max(0, now - ts) * refill)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            cache.set(key, (tokens, now), math.ceil(capacity / refill) + 1)
+    return allowed, 0 if allowed else (1 - tokens) / refill
+
+
+class TokenBucketThrottle(BaseThrottle):
+    scope = None
+    cache_alias = 'default'
+
+    def get_rate(self, view):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def get_cache_key(self, request, view):
+        raise NotImplementedError('.get_cache_key() must be overridden')
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        rate = self.get_rate(view)
+        key = self.get_cache_key(request, view) if rate else None
+        if key is None:
+            return True
+        capacity, refill = parse_rate(rate)
+        allowed, self.wait_seconds = take_token(caches[self.cache_alias], key, capacity, refill)
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+    def principal(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user-{request.user.pk}'
+        return f'ip-{self.get_ident(request)}'
+
+
+class AnonTokenBucketThrottle(TokenBucketThrottle):
+    """Anonymous requests, per client IP."""
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return f'throttle:{self.scope}:ip-{self.get_ident(request)}'
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """All requests, per user (per IP when anonymous)."""
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        return f'throttle:{self.scope}:{self.principal(request)}'
+
+
+class ScopedTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Per-endpoint limits for views that set ``throttle_scope``. Views that
+    also set ``throttle_key_fields`` get a bucket per submitted value of the
+    first of those fields plus client, so one account's login attempts don't
+    use up a whole NATed hall's allowance.
+    """
+
+    def get_rate(self, view):
+        self.scope = getattr(view, 'throttle_scope', None)
+        if self.scope is None:
+            return None
+        return super().get_rate(view)
+
+    def submitted_identity(self, request, view):
+        data = request.data if hasattr(request.data, 'get') else {}
+        for field in getattr(view, 'throttle_key_fields', ()):
+            value = str(data.get(field) or '').strip().lower()
+            if value:
+                # Client-supplied, so hashed to keep keys short and safe for every cache
+                return hashlib.md5(value.encode()).hexdigest()
+        return None
+
+    def get_cache_key(self, request, view):
+        key = f'throttle:{self.scope}:{self.principal(request)}'
+        identity = self.submitted_identity(request, view)
+        return f'{key}:{identity}' if identity else key
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import stream_views, views
 
 router = DefaultRouter()
 router.register(r'meals', views.MealViewSet)
@@ -10,5 +10,9 @@ router.register(r'cart', views.CartViewSet, basename='cart')
 router.register(r'orders', views.OrderViewSet, basename='order')
 
 urlpatterns = [
+    # Ahead of the router, which would read 'events' as an order id
+    path('orders/events/', stream_views.order_events, name='order-events'),
     path('', include(router.urls)),
+    path('payments/webhook/', views.stripe_webhook, name='stripe-webhook'),
+    path('tasks/metrics/', views.TaskMetricsView.as_view(), name='task-metrics'),
 ] 
\ No newline at end of file
@@ -1,12 +1,16 @@
+import logging
+
 from django.shortcuts import render
 from rest_framework import viewsets, status, permissions
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import (
+    action, api_view, authentication_classes, permission_classes, throttle_classes
+)
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
+from django.http import Http404
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 import stripe
 from django.conf import settings
-from rest_framework.filters import SearchFilter
 from .models import (
     Meal, Order, OrderItem, DeliveryType, 
     Location, GiftDetails, Cart, CartItem
@@ -15,47 +19,105 @@ from .serializers import (
     MealSerializer, OrderSerializer, DeliveryTypeSerializer,
     LocationSerializer, CartSerializer, CartItemSerializer
 )
+from . import metrics, payments, reference, task_metrics
+from .replicas import ReplicaReadMixin
+from .checkout import EmptyCartError, reserve_order
+from .menu import snapshot_response
+from .pagination import CreatedAtCursorPagination
+from .search import MealSearchFilter
 from rest_framework.views import APIView
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from rest_framework_simplejwt.tokens import RefreshToken
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
+logger = logging.getLogger(__name__)
 
 class IsOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        return obj.user == request.user
+        # Compare ids so the check doesn't load obj.user
+        return obj.user_id == request.user.pk
+
+# Serializers walk items -> meal; load both with one extra query each time
+def cart_items_prefetch():
+    return Prefetch('items', queryset=CartItem.objects.select_related('meal'))
+
+def order_items_prefetch():
+    return Prefetch('items', queryset=OrderItem.objects.select_related('meal'))
 
-class MealViewSet(viewsets.ReadOnlyModelViewSet):
+class MealViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Meal.objects.filter(is_available=True)
     serializer_class = MealSerializer
     permission_classes = [permissions.AllowAny]
-    filter_backends = [SearchFilter]
-    search_fields = ['name', 'description']
+    filter_backends = [MealSearchFilter]
+    pagination_class = CreatedAtCursorPagination
+    snapshot_params = {'cursor', 'page_size'}
+
+    def paginate_queryset(self, queryset):
+        # Search results are ranked and capped; cursor ordering would undo that
+        if self.request.query_params.get(MealSearchFilter.search_param):
+            return None
+        return super().paginate_queryset(queryset)
+
+    def list(self, request, *args, **kwargs):
+        # Searches and the browsable API go through the regular DRF path
+        if not set(request.query_params) <= self.snapshot_params or request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+
+        def build():
+            queryset = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(queryset)
+            return self.get_paginated_response(self.get_serializer(page, many=True).data).data
 
-class DeliveryTypeViewSet(viewsets.ReadOnlyModelViewSet):
+        return snapshot_response(request, build, variant=sorted(request.query_params.items()))
+
+class CachedReferenceMixin:
+    """Serve list/retrieve from the tiered reference cache instead of the DB."""
+    load_rows = None
+
+    def list(self, request, *args, **kwargs):
+        return Response(self.get_serializer(self.load_rows(), many=True).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        row = reference.find_by_pk(self.load_rows(), kwargs.get(self.lookup_field))
+        if row is None:
+            raise Http404
+        return Response(self.get_serializer(row).data)
+
+class DeliveryTypeViewSet(ReplicaReadMixin, CachedReferenceMixin, viewsets.ReadOnlyModelViewSet):
     queryset = DeliveryType.objects.all()
     serializer_class = DeliveryTypeSerializer
     permission_classes = [permissions.AllowAny]
+    load_rows = staticmethod(reference.get_delivery_types)
 
-class LocationViewSet(viewsets.ReadOnlyModelViewSet):
+class LocationViewSet(ReplicaReadMixin, CachedReferenceMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Location.objects.all()
     serializer_class = LocationSerializer
     permission_classes = [permissions.AllowAny]
+    load_rows = staticmethod(reference.get_locations)
 
-class CartViewSet(viewsets.ModelViewSet):
+class CartViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     serializer_class = CartSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    # Carts are always read from the primary; changes pin the user to it
+    replica_actions = set()
+    max_batch_lines = 50
 
     def get_queryset(self):
-        return Cart.objects.filter(user=self.request.user)
+        return Cart.objects.filter(user=self.request.user).prefetch_related(cart_items_prefetch())
 
-    def get_object(self):
+    def get_cart(self):
         cart, _ = Cart.objects.get_or_create(user=self.request.user)
         return cart
 
+    def get_object(self):
+        # Fully loaded cart for responses; mutations only need get_cart()
+        cart = self.get_cart()
+        prefetch_related_objects([cart], cart_items_prefetch())
+        return cart
+
+    @transaction.atomic
     def create(self, request):
-        cart = self.get_object()
+        cart = self.get_cart()
         serializer = CartItemSerializer(data=request.data)
         
         if serializer.is_valid():
@@ -67,7 +129,7 @@ class CartViewSet(viewsets.ModelViewSet):
             
             try:
                 # Update existing cart item if it exists
-                cart_item = CartItem.objects.get(cart=cart, meal_id=meal_id)
+                cart_item = CartItem.objects.select_for_update().get(cart=cart, meal_id=meal_id)
                 cart_item.quantity = quantity
                 cart_item.portions = portions
                 cart_item.plates = plates
@@ -83,16 +145,60 @@ class CartViewSet(viewsets.ModelViewSet):
                     plates=plates,
                     special_instructions=special_instructions
                 )
+            metrics.inc('cart_mutations_total', action='add')
             
             # Return the updated cart data
-            cart_serializer = self.get_serializer(cart)
+            cart_serializer = self.get_serializer(self.get_object())
             return Response(cart_serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'])
+    @transaction.atomic
+    def batch(self, request):
+        lines = request.data.get('items') if isinstance(request.data, dict) else request.data
+        if not isinstance(lines, list) or not lines:
+            return Response({'error': 'items must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(lines) > self.max_batch_lines:
+            return Response(
+                {'error': f'At most {self.max_batch_lines} items per batch'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Validate every line; bad lines are reported, the rest still apply
+        errors, valid = [], []
+        for index, line in enumerate(lines):
+            serializer = CartItemSerializer(data=line)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                errors.append({'index': index, 'errors': serializer.errors})
+
+        prices = dict(
+            Meal.objects.filter(id__in={data['meal_id'] for _, data in valid}, is_available=True)
+            .values_list('id', 'price')
+        )
+        applied = []
+        for index, data in valid:
+            if data['meal_id'] in prices:
+                applied.append(data)
+            else:
+                errors.append({'index': index, 'errors': {'meal_id': ['Meal not found or unavailable.']}})
+
+        if applied:
+            self.get_cart().upsert_items(applied, prices)
+            metrics.inc('cart_mutations_total', action='batch')
+
+        errors.sort(key=lambda error: error['index'])
+        return Response(
+            {'cart': self.get_serializer(self.get_object()).data, 'errors': errors},
+            status=status.HTTP_200_OK if applied or not errors else status.HTTP_400_BAD_REQUEST
+        )
+
+    @transaction.atomic
     def update(self, request, pk=None):
-        cart = self.get_object()
+        cart = self.get_cart()
         try:
-            cart_item = cart.items.get(id=pk)
+            cart_item = cart.items.select_for_update().get(id=pk)
             serializer = CartItemSerializer(cart_item, data=request.data, partial=True)
             
             if serializer.is_valid():
@@ -107,81 +213,124 @@ class CartViewSet(viewsets.ModelViewSet):
                     cart_item.special_instructions = serializer.validated_data['special_instructions']
                 
                 cart_item.save()
-                return Response(self.get_serializer(cart).data)
+                metrics.inc('cart_mutations_total', action='update')
+                return Response(self.get_serializer(self.get_object()).data)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except CartItem.DoesNotExist:
             return Response({'error': 'Cart item not found'}, status=status.HTTP_404_NOT_FOUND)
 
+    @transaction.atomic
     def destroy(self, request, pk=None):
-        cart = self.get_object()
+        cart = self.get_cart()
         try:
-            cart_item = cart.items.get(id=pk)
+            cart_item = cart.items.select_for_update().get(id=pk)
             cart_item.delete()
-            return Response(self.get_serializer(cart).data)
+            metrics.inc('cart_mutations_total', action='remove')
+            return Response(self.get_serializer(self.get_object()).data)
         except CartItem.DoesNotExist:
             return Response({'error': 'Item not found'}, status=status.HTTP_404_NOT_FOUND)
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        return (
+            Order.objects.filter(user=self.request.user)
+            .select_related('delivery_type', 'location', 'gift_details')
+            .prefetch_related(order_items_prefetch())
+        )
 
-    @transaction.atomic
     def create(self, request, *args, **kwargs):
-        cart = Cart.objects.get(user=request.user)
-        if not cart.items.exists():
-            return Response(
-                {'error': 'Cannot create order with empty cart'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # Calculate total amount
-        cart_total = cart.total_amount
-        delivery_type = get_object_or_404(DeliveryType, id=request.data.get('delivery_type_id'))
-        total_amount = cart_total + delivery_type.price
+        delivery_type = reference.get_delivery_type(request.data.get('delivery_type_id'))
+        if delivery_type is None:
+            raise Http404('No DeliveryType matches the given query.')
 
         try:
-            # Create order
             serializer = self.get_serializer(data=request.data)
             serializer.is_valid(raise_exception=True)
-            order = serializer.save(
-                user=request.user,
-                total_amount=total_amount,
-                status='pending'  # Set initial status
+            order = reserve_order(request.user, serializer, delivery_type)
+        except EmptyCartError:
+            return Response(
+                {'error': 'Cannot create order with empty cart'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-
-            # Create order items from cart items
-            for cart_item in cart.items.all():
-                OrderItem.objects.create(
-                    order=order,
-                    meal=cart_item.meal,
-                    quantity=cart_item.quantity,
-                    portions=cart_item.portions,
-                    plates=cart_item.plates,
-                    special_instructions=cart_item.special_instructions,
-                    unit_price=cart_item.meal.price,
-                    total_price=cart_item.total_price
-                )
-
-            # Clear the cart
-            cart.items.all().delete()
-
-            return Response({
-                'order': serializer.data,
-                'message': 'Order created successfully'
-            }, status=status.HTTP_201_CREATED)
-
         except Exception as e:
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        # Serialize outside the checkout transaction, from the prefetched graph.
+        # With an eager broker the worker has already run and items are in.
+        order = self.get_queryset().get(pk=order.pk)
+        metrics.inc('orders_created_total', delivery_type=order.delivery_type.name, location=order.location.name)
+        return Response({
+            'order': self.get_serializer(order).data,
+            'message': 'Order accepted'
+        }, status=status.HTTP_202_ACCEPTED)
+
     @action(detail=True, methods=['post'])
     def confirm_payment(self, request, pk=None):
         order = self.get_object()
+        if settings.PAYMENT_INTENTS_ENABLED:
+            # Stripe's webhook is the source of truth; watch /api/orders/events/
+            return Response(
+                {'status': 'Awaiting payment confirmation', 'order_status': order.status},
+                status=status.HTTP_202_ACCEPTED
+            )
         order.status = 'paid'
         order.save()
+        metrics.inc('payment_confirmations_total', source='manual')
         return Response({'status': 'Payment confirmed'})
+
+    @action(detail=True, methods=['get'])
+    def payment(self, request, pk=None):
+        """The intent's client secret, for the frontend to confirm the payment with Stripe.js."""
+        order = self.get_object()
+        if not settings.PAYMENT_INTENTS_ENABLED:
+            return Response({'error': 'Payment intents are disabled'}, status=status.HTTP_404_NOT_FOUND)
+        if order.status not in ('accepted', 'pending'):
+            return Response({'error': f'Order is {order.status}'}, status=status.HTTP_409_CONFLICT)
+        if not order.payment_intent_id:
+            # process_order hasn't opened the intent yet; poll or watch /api/orders/events/
+            return Response({'status': 'Preparing payment', 'order_status': order.status},
+                            status=status.HTTP_202_ACCEPTED)
+        try:
+            intent = payments.retrieve_payment_intent(order)
+        except stripe.error.StripeError:
+            logger.exception('Could not retrieve payment intent %s', order.payment_intent_id)
+            return Response({'error': 'Payment provider unavailable'}, status=status.HTTP_502_BAD_GATEWAY)
+        response = Response({
+            'payment_intent_id': intent.id,
+            'client_secret': intent.client_secret,
+            'publishable_key': settings.STRIPE_PUBLIC_KEY,
+            'status': intent.status,
+        })
+        response['Cache-Control'] = 'no-store'
+        return response
+
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([permissions.AllowAny])
+# Stripe delivers from a few shared IPs and backs off on 429, delaying confirmations
+@throttle_classes([])
+def stripe_webhook(request):
+    # Verify against the raw body before DRF parses it
+    try:
+        event = payments.verify_event(request.body, request.META.get('HTTP_STRIPE_SIGNATURE', ''))
+    except (ValueError, stripe.error.SignatureVerificationError):
+        return Response({'error': 'Invalid payload or signature'}, status=status.HTTP_400_BAD_REQUEST)
+    with transaction.atomic():
+        payments.record_event(event)
+    return Response({'received': True})
+
+class TaskMetricsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'queue_depth': task_metrics.queue_depth(),
+            'tasks': task_metrics.task_stats(),
+        })
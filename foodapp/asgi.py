@@ -2,6 +2,13 @@
 ASGI config for foodapp project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with ``gunicorn foodapp.asgi:application -k uvicorn.workers.UvicornWorker``
+so the order event streams (api/stream_views.py) are held by the event loop
+rather than a worker each.
+
+Persistent database connections are off by default here: sync views run on
+a fresh thread per request, so CONN_MAX_AGE would leave a connection open
+behind every one of them. Use DB_POOL_MAX_SIZE to reuse connections.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -12,5 +19,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodapp.settings')
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -0,0 +1,19 @@
+"""
+Celery application for foodapp.
+
+Workers: ``celery -A foodapp worker -l info``, plus one
+``celery -A foodapp beat`` for the periodic tasks in CELERY_BEAT_SCHEDULE.
+Without CELERY_BROKER_URL the app uses the in-memory broker with eager
+execution, so tasks run inline in the web process (local development and
+tests).
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodapp.settings')
+
+app = Celery('foodapp')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -15,6 +15,10 @@ from pathlib import Path
 from datetime import timedelta
 import secrets
 
+from django.core.exceptions import ImproperlyConfigured
+
+from foodapp import database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -36,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    'whitenoise.runserver_nostatic',
     'django.contrib.staticfiles',
     'rest_framework',
     'corsheaders',
@@ -44,6 +49,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Static files are answered before admission control, as they cost next to nothing
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Ahead of admission control, so shed requests are counted too
+    'api.metrics.MetricsMiddleware',
+    'api.middleware.AdmissionControlMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,10 +61,32 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Innermost, so its timings cover the view and nothing else
+    'api.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'foodapp.urls'
 
+# Admission control (api/middleware.py): requests that waited longer than
+# this, per X-Request-Start or for a concurrency slot, get 503 + Retry-After
+ADMISSION_MAX_QUEUE_MS = int(os.environ.get('ADMISSION_MAX_QUEUE_MS', 2000))
+# In-flight requests per process; 0 only checks queue time (sync workers)
+ADMISSION_MAX_CONCURRENCY = int(os.environ.get('ADMISSION_MAX_CONCURRENCY', 32))
+# Only under ASGI; WSGI workers refuse event streams (api/stream_views.py)
+ADMISSION_EXEMPT_PATHS = ['/api/orders/events/']
+
+# Staff requests sent with X-Profile: 1 get a Server-Timing breakdown (api/profiling.py).
+# When enabled, ApiConfig.ready() wraps BaseSerializer.data process-wide to time serialization
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'True').lower() == 'true'
+# A normalized statement run this many times in one request is flagged as N+1
+PROFILING_DUPLICATE_THRESHOLD = int(os.environ.get('PROFILING_DUPLICATE_THRESHOLD', 3))
+PROFILING_TOP_QUERIES = 5
+
+# Prometheus metrics at /metrics (api/metrics.py), scraped with this bearer token
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Seconds each process buffers its counts before adding them to the shared cache
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+
 CSRF_TRUSTED_ORIGINS = [
     "https://backendtesting-production-dcfc.up.railway.app",
 ]
@@ -78,12 +110,97 @@ TEMPLATES = [
 WSGI_APPLICATION = 'foodapp.wsgi.application'
 
 # Database
+# DATABASE_URL picks SQLite (WAL, single node) or Postgres (multi-node); see
+# foodapp/database.py. DB_POOL_MAX_SIZE > 0 switches Postgres to Django's
+# psycopg 3 pool, sized at least to the threads per process. foodapp/asgi.py
+# defaults DB_CONN_MAX_AGE to 0, since persistent connections leak under ASGI.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+    'default': database.parse(
+        os.environ.get('DATABASE_URL', 'sqlite:///db.sqlite3'),
+        BASE_DIR,
+        conn_max_age=int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        pool_max_size=int(os.environ.get('DB_POOL_MAX_SIZE', 0)),
+        sqlite_timeout=float(os.environ.get('DB_SQLITE_TIMEOUT', 20)),
+    ),
+}
+
+# Read replicas (api/replicas.py), e.g. sqlite:///db-replica.sqlite3 kept in
+# step locally by `manage.py sync_sqlite_replicas`. Tests read them from default.
+REPLICA_DATABASES = []
+for index, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), 1):
+    REPLICA_DATABASES.append(f'replica{index}')
+    DATABASES[f'replica{index}'] = {
+        **database.parse(
+            url.strip(), BASE_DIR,
+            conn_max_age=DATABASES['default']['CONN_MAX_AGE'],
+            pool_max_size=int(os.environ.get('DB_POOL_MAX_SIZE', 0)),
+        ),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['api.replicas.PrimaryReplicaRouter']
+# Seconds a user reads from the primary after changing their cart or orders
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
+# Cache
+# 'default' is the shared tier (Redis when REDIS_URL is set). 'tiered' puts a
+# per-process LRU in front of it for hot reference data; writes are fanned out
+# over Redis pub/sub so every gunicorn worker drops its stale L1 copy.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
     }
+
+CACHES['tiered'] = {
+    'BACKEND': 'api.cache.TieredCache',
+    'LOCATION': 'default',
+    'OPTIONS': {
+        'L1_MAX_ENTRIES': int(os.environ.get('CACHE_L1_MAX_ENTRIES', 1000)),
+        'L1_TIMEOUT': int(os.environ.get('CACHE_L1_TIMEOUT', 30)),
+        'BUS_URL': REDIS_URL or None,
+    },
+}
+
+# Order status streams fan out through Redis pub/sub when available
+ORDER_EVENTS_URL = os.environ.get('ORDER_EVENTS_URL', REDIS_URL or None)
+
+# Celery
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', REDIS_URL or 'memory://')
+CELERY_TASK_ALWAYS_EAGER = os.environ.get(
+    'CELERY_TASK_ALWAYS_EAGER', str(CELERY_BROKER_URL == 'memory://')
+).lower() == 'true'
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_DEFAULT_QUEUE = 'celery'
+# Run with ``celery -A foodapp beat``
+CELERY_BEAT_SCHEDULE = {
+    # Retries payment events that arrived before their order's intent id was stored
+    'apply-payment-events': {'task': 'api.tasks.apply_payment_events', 'schedule': 60.0},
+    'sweep-unprocessed-orders': {'task': 'api.tasks.sweep_unprocessed_orders', 'schedule': 60.0},
 }
+# Seconds before an order still unprocessed ('accepted', or 'pending' without a
+# payment intent) is queued again, and before it is cancelled
+ORDER_REQUEUE_AFTER = int(os.environ.get('ORDER_REQUEUE_AFTER', 120))
+ORDER_PROCESSING_DEADLINE = int(os.environ.get('ORDER_PROCESSING_DEADLINE', 1800))
+
+# Username or email sign-in with one indexed lookup (api/backends.py)
+AUTHENTICATION_BACKENDS = ['api.backends.EmailOrUsernameBackend']
+
+# Password hashing pool (api/hashing.py), per process
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_BACKLOG = int(os.environ.get('PASSWORD_HASH_BACKLOG', 16))
+PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5))
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -113,17 +230,66 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+STORAGES = {
+    # Files are named by content hash, so identical uploads share one blob
+    'default': {'BACKEND': 'api.storage.ContentAddressedStorage'},
+    # collectstatic writes hashed names plus .gz/.br copies; WhiteNoise
+    # serves the hashed ones with far-future, immutable cache headers. Not
+    # strict, so a deploy that skipped collectstatic serves unhashed names
+    # instead of failing every admin page (the api.W001 check flags it)
+    'staticfiles': {'BACKEND': 'api.storage.LenientManifestStaticFilesStorage'},
+}
+
+# Media delivery (api/media_views.py): 'django' streams from the app with
+# Range support, 'accel' hands off to nginx via X-Accel-Redirect to an
+# internal location aliased to MEDIA_ROOT, 'sendfile' to Apache/lighttpd
+MEDIA_SERVE_MODE = os.environ.get('MEDIA_SERVE_MODE', 'django')
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+# Cache lifetime of media not under a content-hashed name
+MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', 3600))
+
+# Image pipeline (api/images.py)
+IMAGE_MAX_PIXELS = 40_000_000
+PROFILE_IMAGE_MAX_BYTES = 5 * 1024 * 1024
+# Longest edge in pixels for each variant
+PROFILE_IMAGE_SIZES = {'small': 96, 'medium': 256, 'large': 512}
+MEAL_IMAGE_SIZES = {'thumb': 300, 'medium': 768, 'full': 1600}
+# Without a broker, variants are built on this many threads per process
+# rather than inline in the upload request; 0 builds them inline
+IMAGE_TASK_WORKERS = int(os.environ.get('IMAGE_TASK_WORKERS', 2))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Token buckets in the default cache (api/throttling.py); views opt into
+    # a stricter per-endpoint bucket with throttle_scope. Without REDIS_URL
+    # that cache is per process, so each worker enforces these rates on its own
+    # and the effective limit is the rate times the number of workers
+    'DEFAULT_THROTTLE_CLASSES': (
+        'api.throttling.AnonTokenBucketThrottle',
+        'api.throttling.UserTokenBucketThrottle',
+        'api.throttling.ScopedTokenBucketThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': os.environ.get('THROTTLE_ANON', '120/min'),
+        'user': os.environ.get('THROTTLE_USER', '600/min'),
+        # Per account and client IP, so students behind one campus NAT don't share it
+        'login': os.environ.get('THROTTLE_LOGIN', '10/min'),
+        'register': os.environ.get('THROTTLE_REGISTER', '5/min'),
+        'password_reset': os.environ.get('THROTTLE_PASSWORD_RESET', '5/hour'),
+    },
+    # Proxies in front of the app (Railway's edge by default). Client IPs for
+    # throttling are read this many entries from the end of X-Forwarded-For,
+    # so clients can't pick their own by sending the header; 0 uses REMOTE_ADDR.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 1)),
 }
 
 # JWT settings
@@ -132,6 +298,8 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    # Tokens carry a hash of the password hash; changing the password revokes them
+    'CHECK_REVOKE_TOKEN': True,
 }
 
 # CORS settings
@@ -166,15 +334,24 @@ else:
 
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'noreply@northcafe.com')
 
-AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
-]
-
 SITE_ID = 1
 
 # Stripe settings
 STRIPE_PUBLIC_KEY = os.environ.get('STRIPE_PUBLIC_KEY', 'pk_test_dummykey')
 STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY', 'sk_test_dummykey')
+# No default: webhooks signed with a publicly known secret could mark orders paid
+STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET', '')
+STRIPE_CURRENCY = os.environ.get('STRIPE_CURRENCY', 'ngn')
+# Point at a local stand-in (e.g. stripe-mock) in development
+STRIPE_API_BASE = os.environ.get('STRIPE_API_BASE', 'https://api.stripe.com')
+STRIPE_HTTP_POOL_SIZE = int(os.environ.get('STRIPE_HTTP_POOL_SIZE', 10))
+STRIPE_TIMEOUT = int(os.environ.get('STRIPE_TIMEOUT', 20))
+# Seconds webhook events are gathered before a batch is applied
+PAYMENT_EVENT_BATCH_WINDOW = int(os.environ.get('PAYMENT_EVENT_BATCH_WINDOW', 2))
+# Off until real keys are configured; orders then skip straight to 'pending'
+PAYMENT_INTENTS_ENABLED = os.environ.get('PAYMENT_INTENTS_ENABLED', 'False').lower() == 'true'
+if PAYMENT_INTENTS_ENABLED and not DEBUG and not STRIPE_WEBHOOK_SECRET:
+    raise ImproperlyConfigured('PAYMENT_INTENTS_ENABLED needs STRIPE_WEBHOOK_SECRET')
 
 # Security settings for production
 if not DEBUG:
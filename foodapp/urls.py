@@ -15,14 +15,10 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
 from django.views.generic import RedirectView
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
+from rest_framework_simplejwt.views import TokenRefreshView
 from api.auth_views import (
     UserRegistrationView,
     UserLoginView,
@@ -30,8 +26,11 @@ from api.auth_views import (
     UserProfileView,
     PasswordResetRequestView,
     PasswordResetConfirmView,
-    ProfileUpdateView
+    ProfileUpdateView,
+    ThrottledTokenObtainPairView
 )
+from api.media_views import serve_media
+from api.metrics import metrics_view
 
 urlpatterns = [
     path('', RedirectView.as_view(url='/admin/')),
@@ -41,12 +40,12 @@ urlpatterns = [
     path('api/auth/logout/', UserLogoutView.as_view(), name='logout'),
     path('api/auth/profile/', UserProfileView.as_view(), name='profile'),
     path('api/auth/profile/update/', ProfileUpdateView.as_view(), name='profile-update'),
-    path('api/auth/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/auth/token/', ThrottledTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/auth/password-reset/', PasswordResetRequestView.as_view(), name='password-reset'),
     path('api/auth/password-reset/confirm/', PasswordResetConfirmView.as_view(), name='password-reset-confirm'),
     path('api/', include('api.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-
-if settings.DEBUG:
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+    path('metrics', metrics_view, name='metrics'),
+    # Static files are served by WhiteNoise, in development too
+    re_path(rf'^{settings.MEDIA_URL.lstrip("/")}(?P<path>.+)$', serve_media, name='media'),
+]